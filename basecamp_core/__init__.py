@@ -0,0 +1,24 @@
+"""
+The database side of Basecamp, with no PyQt in it, so scripts and servers can use it without a QApplication.
+Importing it doesn't touch the database: the connection is opened (and the schema migrated) on the first query.
+Problems are raised as BasecampError subclasses instead of popping up, the app turns them into message boxes.
+
+    import basecamp_core
+    basecamp_core.full_text_search("katahdin", "mountain")
+"""
+from .errors import BasecampError, InvalidInputError, NotFoundError, DatabaseError, FileError
+from .connection import db, db_path, base_dir, PROFILES, ConnectionManager
+from .schema import migrate, SCHEMA_VERSION
+from .cache import change_counter, query_cache, cached_query
+from .records import type_map, columns, US_States, Campsite, Mountain, records, validate_type, validate_item, validate_value
+from .backup import backups, create_backup, BackupManager
+from .items import create_item, remove_item, replace_info, item_search, update_matching, delete_matching
+from .search import full_text_search
+from .importer import import_file
+from .filtering import sort_and_filter, sort_and_filter_page, PAGE_SIZE, Query, parse_filter, looks_like_filter
+from .export import export_items
+from .stats import statistics, distribution, PERCENTILES, climb_rollups, climb_streaks, year_over_year
+from .geo import items_in_bbox, items_within_radius, nearest, nearest_to_item, haversine_km
+from .maps import make_main_map, MAP_STEPS
+from .clusters import clusters_in_view, map_tile, update_clusters
+from .aio import AsyncDatabase
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .connection import db
+from .items import create_item
+from .search import full_text_search
+from .filtering import sort_and_filter_page
+from .stats import statistics
+from .importer import import_file
+
+logger = logging.getLogger(__name__)
+
+#=== Async API ===
+"""
+The core functions block while sqlite works, so an asyncio program (a local JSON service, a qasync UI)
+runs them through AsyncDatabase instead. Calls go to a small pool of worker threads that only do database work,
+each with its own connection from the connection manager, and the event loop keeps running in the meantime.
+
+Back-pressure: at most max_pending calls are queued or running. Further calls wait (without blocking the loop)
+until one finishes, so a burst of requests can't pile up unbounded work behind the database.
+Cancellation: cancelling the awaiting task drops the call if it hasn't started, or interrupts the running query
+with sqlite's interrupt(). An import stops at the next chunk; the chunks already saved stay saved.
+
+    database = AsyncDatabase()
+    results = await database.search("katahdin", "mountain")
+    database.close()
+"""
+DB_WORKERS = 2 #worker threads, each one holds a connection from the pool
+MAX_PENDING = 64 #calls queued or running before new ones have to wait
+
+class AsyncDatabase:
+    def __init__(self, workers=DB_WORKERS, max_pending=MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='basecamp-db')
+        self.slots = asyncio.Semaphore(max_pending) #the bound on the queue
+        self.lock = threading.Lock()
+        self.running = {} #call id -> connection it's running on, so it can be interrupted
+        self.cancelled = set() #call ids whose caller has gone away
+        self.next_id = 0
+
+    def call(self, call_id, function, args, kwargs): #runs on a worker thread
+        conn = db.connection()
+        with self.lock:
+            if call_id in self.cancelled: #cancelled while it was waiting in the queue
+                self.cancelled.discard(call_id)
+                return None
+            self.running[call_id] = conn
+        try:
+            return function(*args, **kwargs)
+        finally:
+            with self.lock: #removed under the lock so an interrupt can't land on the next call
+                self.running.pop(call_id, None)
+                self.cancelled.discard(call_id)
+
+    def cancel(self, call_id):
+        with self.lock:
+            self.cancelled.add(call_id)
+            conn = self.running.get(call_id)
+            if conn is not None:
+                conn.interrupt() #the running statement fails with "interrupted"
+                logger.info(f"Database call {call_id} interrupted.")
+
+    def is_cancelled(self, call_id):
+        with self.lock:
+            return call_id in self.cancelled
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    async def run(self, function, *args, **kwargs): #runs a blocking core function on the pool and waits for it
+        return await self.run_as(self.new_id(), function, *args, **kwargs)
+
+    async def run_as(self, call_id, function, *args, **kwargs):
+        async with self.slots: #waits here while max_pending calls are already queued or running
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self.call, call_id, function, args, kwargs)
+            try:
+                return await future
+            except asyncio.CancelledError:
+                self.cancel(call_id)
+                raise
+
+    async def search(self, text, type, limit=50):
+        return await self.run(full_text_search, text, type, limit)
+
+    async def filter(self, column, value, order, type, after=None): #one page, same as sort_and_filter_page
+        return await self.run(sort_and_filter_page, column, value, order, type, after)
+
+    async def query(self, query, after=None): #one page of a Query, same as query.page()
+        return await self.run(query.page, after)
+
+    async def stats(self, type):
+        return await self.run(statistics, type)
+
+    async def insert(self, type, info):
+        return await self.run(create_item, type, info)
+
+    async def import_file(self, path, type, progress=None):
+        """
+        Same report as import_file. progress is called on the event loop with the rows read so far.
+        A cancelled import also stops between chunks, where there's no query running to interrupt.
+        """
+        loop = asyncio.get_running_loop()
+        call_id = self.new_id()
+
+        def chunk_done(rows): #called on the worker after each chunk
+            if self.is_cancelled(call_id):
+                raise asyncio.CancelledError #a BaseException, so import_file doesn't turn it into a report error
+            if progress is not None:
+                loop.call_soon_threadsafe(progress, rows)
+
+        return await self.run_as(call_id, import_file, path, type, progress=chunk_done)
+
+    def close(self): #waits for running calls, then gives the workers' connections back
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        db.reap()
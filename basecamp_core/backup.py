@@ -0,0 +1,107 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from .connection import db, base_dir
+
+logger = logging.getLogger(__name__)
+
+#=== Backups ===
+"""
+Backups are made with sqlite's online backup API on a background thread, so a write never waits on a file copy.
+Writes only ask for a backup; if more writes come in before BACKUP_DELAY runs out they share the same backup.
+Each backup is a timestamped snapshot in the backups folder and only the newest BACKUP_KEEP are kept.
+"""
+BACKUP_DIR = os.path.join(base_dir, 'backups')
+BACKUP_KEEP = 5 #number of snapshots to keep
+BACKUP_DELAY = 2.0 #seconds of no writes before the backup runs
+BACKUP_PAGES = 256 #pages copied per step, other connections can write in between steps
+
+class BackupManager:
+    def __init__(self, manager, backup_dir=BACKUP_DIR, keep=BACKUP_KEEP, delay=BACKUP_DELAY, pages=BACKUP_PAGES):
+        self.manager = manager #connection manager to read the database from
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.delay = delay
+        self.pages = pages
+        self.prefix = os.path.splitext(os.path.basename(manager.path))[0] + '_'
+        self.cond = threading.Condition()
+        self.deadline = None #when the pending backup should run, None if nothing is pending
+        self.thread = None
+
+    def request(self): #asks for a backup, pushing it back if one is already waiting
+        with self.cond:
+            self.deadline = time.monotonic() + self.delay
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='backup', daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def run(self): #backup thread, waits out the delay then backs up until nothing is pending
+        try:
+            while True:
+                with self.cond:
+                    if self.deadline is None:
+                        self.thread = None
+                        return
+                    remaining = self.deadline - time.monotonic()
+                    if remaining > 0:
+                        self.cond.wait(remaining)
+                        continue
+                    self.deadline = None
+                self.backup_now()
+        finally:
+            self.manager.release() #gives this thread's connection back to the pool
+
+    def backup_now(self): #copies the database into a new snapshot
+        os.makedirs(self.backup_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        backup_file = os.path.join(self.backup_dir, f"{self.prefix}{stamp}.db")
+        partial_file = backup_file + '.part' #so an unfinished backup is never mistaken for a snapshot
+
+        try:
+            source = self.manager.connection()
+            target = sqlite3.connect(partial_file)
+            try:
+                source.backup(target, pages=self.pages, sleep=0.01)
+            finally:
+                target.close()
+            os.replace(partial_file, backup_file)
+            logger.info(f"Backup created: {backup_file}")
+            self.rotate()
+            return backup_file
+        except (sqlite3.Error, OSError) as e:
+            logger.error(f"Backup Error: {e}")
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+
+    def snapshots(self): #existing snapshots, oldest first (the timestamp in the name sorts correctly)
+        if not os.path.isdir(self.backup_dir):
+            return []
+        files = [f for f in os.listdir(self.backup_dir) if f.startswith(self.prefix) and f.endswith('.db')]
+        return [os.path.join(self.backup_dir, f) for f in sorted(files)]
+
+    def rotate(self): #deletes the oldest snapshots past the limit
+        old = self.snapshots()[:-self.keep] if self.keep > 0 else []
+        for path in old:
+            try:
+                os.remove(path)
+                logger.info(f"Old backup removed: {path}")
+            except OSError as e:
+                logger.error(f"Could not remove old backup {path}: {e}")
+
+    def stop(self): #runs a pending backup right away and waits for it, used when the application exits
+        with self.cond:
+            thread = self.thread
+            if self.deadline is not None:
+                self.deadline = time.monotonic()
+                self.cond.notify()
+        if thread is not None:
+            thread.join()
+
+backups = BackupManager(db)
+
+def create_backup(): #schedules a backup in the background
+    backups.request()
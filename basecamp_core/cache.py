@@ -0,0 +1,114 @@
+import sys
+import sqlite3
+import logging
+import threading
+import functools
+from collections import OrderedDict
+from .connection import db
+from .records import Campsite, Mountain
+
+logger = logging.getLogger(__name__)
+
+def change_counter(): #current value of the change counter (db_changes, kept up to date by triggers)
+    with db.cursor() as c:
+        return c.execute("SELECT counter FROM db_changes WHERE id = 1").fetchone()[0]
+
+#=== Result Cache ===
+"""
+Results of the read functions the pages call (searches, sort_and_filter, statistics) are kept in memory,
+keyed on the function and its arguments (trimmed and lowercased, since the lookups ignore case).
+The cache remembers the change counter it was filled at and empties itself as soon as the counter moves,
+so it never returns results from before a write. Least recently used results are dropped past the limits.
+"""
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_BYTES = 32 * 1024 * 1024 #rough size of the cached results
+
+def result_size(result): #rough memory use of a result (a list/tuple of strings, tuples, records or numbers)
+    size = sys.getsizeof(result)
+    if isinstance(result, (list, tuple)):
+        for item in result:
+            size += sys.getsizeof(item)
+            if isinstance(item, (list, tuple)):
+                size += sum(sys.getsizeof(value) for value in item)
+            elif isinstance(item, (Campsite, Mountain)):
+                size += sum(sys.getsizeof(getattr(item, name)) for name in item.__slots__)
+    return size
+
+class QueryCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() #key -> (size, result), most recently used last
+        self.bytes = 0
+        self.counter = None #change counter the entries belong to
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, counter): #returns (True, result) on a hit, (False, None) on a miss
+        with self.lock:
+            if counter != self.counter: #the database changed, everything cached is stale
+                self.entries.clear()
+                self.bytes = 0
+                self.counter = counter
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key][1]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, counter, result):
+        size = result_size(result)
+        with self.lock:
+            if counter != self.counter or size > self.max_bytes: #stale already, or too big to keep
+                return
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[0]
+            self.entries[key] = (size, result)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.bytes -= self.entries.popitem(last=False)[1][0]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.counter = None
+
+query_cache = QueryCache()
+
+def cache_key(value): #normalizes arguments so 'Maine ' and 'maine' share an entry
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, (list, tuple)):
+        return tuple(cache_key(item) for item in value)
+    return value
+
+def result_copy(value): #copies the containers all the way down, so callers can't change the cached result
+    if isinstance(value, list):
+        return [result_copy(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(result_copy(item) for item in value)
+    if isinstance(value, dict):
+        return {key: result_copy(item) for key, item in value.items()}
+    if isinstance(value, set):
+        return {result_copy(item) for item in value}
+    return value #strings, numbers and records are shared
+
+def cached_query(function): #decorator that serves repeat calls from query_cache
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (function.__name__, cache_key(args), cache_key(tuple(sorted(kwargs.items()))))
+        try:
+            counter = change_counter()
+        except sqlite3.Error as e: #can't tell if the cache is current, so it isn't used
+            logger.error(f"Database Error: {e}")
+            return function(*args, **kwargs)
+
+        hit, result = query_cache.get(key, counter)
+        if not hit:
+            result = function(*args, **kwargs) #errors are raised, so only real results get cached
+            query_cache.put(key, counter, result)
+        return result_copy(result)
+    return wrapper
@@ -0,0 +1,217 @@
+import math
+import logging
+import threading
+from .connection import db
+from .errors import InvalidInputError, database_errors
+from .schema import transaction
+from .maps import MAP_FIELDS
+
+logger = logging.getLogger(__name__)
+
+#=== Map Clusters ===
+"""
+The map asks for the clusters in view at its zoom level instead of getting every point.
+Points are placed on the web mercator map (0 to 1 across the world) and grouped into square cells of
+CLUSTER_PIXELS screen pixels. A cell at one zoom level is exactly four cells of the next, so each level
+is worked out from the one below it. map_clusters keeps every cell's campsite and mountain counts and the
+sum of its points' positions (for the centre of the cluster).
+
+The clusters are never rebuilt: triggers log each added/removed point in map_changes, and update_clusters()
+adds those to the cells and clears the log in the same transaction before clusters are read. With nothing
+logged it's a single read, so asking for tiles doesn't take the write lock away from the app.
+Past CLUSTER_MAX_ZOOM, and for cells with only a few points, the real points are sent instead.
+"""
+CLUSTER_PIXELS = 64 #size of a cluster cell on screen
+CLUSTER_MAX_ZOOM = 12 #zoomed in further than this the points are sent without clustering
+CLUSTER_EXPAND = 3 #cells with this many points or fewer are sent as their points
+UPDATE_BATCH = 50000 #logged changes applied per transaction
+MAX_LATITUDE = 85.0511287798 #web mercator stops here
+
+update_lock = threading.Lock() #one update at a time in this process, BEGIN IMMEDIATE covers other processes
+
+def project(longitude, latitude): #web mercator, (0, 0) is the top left of the world and (1, 1) the bottom right
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    sin = math.sin(math.radians(latitude))
+    return (longitude + 180) / 360, 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+
+def unproject(x, y): #back to (longitude, latitude)
+    return x * 360 - 180, math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+def cells_across(zoom): #cells across the world at a zoom level
+    return 256 * 2 ** zoom // CLUSTER_PIXELS
+
+def square_of(x, y, across): #which square a projected point is in, with the world cut into across x across squares
+    return min(int(x * across), across - 1), min(int(y * across), across - 1)
+
+def cell_of(x, y, zoom):
+    return square_of(x, y, cells_across(zoom))
+
+
+def project_arrays(longitudes, latitudes): #project() for NumPy arrays
+    import numpy as np
+    sin = np.sin(np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE)))
+    return (longitudes + 180) / 360, 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+
+def update_clusters(): #applies the logged point changes to map_clusters, returns how many were applied
+    import numpy as np #only loaded once the map asks for clusters, it's slow to import
+    conn = db.connection()
+    applied = 0
+    with update_lock, database_errors():
+        #a plain read first, the write lock (BEGIN IMMEDIATE) is only taken when there's something to apply
+        while conn.execute("SELECT 1 FROM map_changes LIMIT 1").fetchone() is not None:
+            with transaction(conn) as c:
+                changes = c.execute("SELECT seq, type, longitude, latitude, change FROM map_changes ORDER BY seq LIMIT ?",
+                                    (UPDATE_BATCH,)).fetchall()
+                if not changes: #another process applied them in between
+                    break
+
+                _, types, longitudes, latitudes, signs = zip(*changes)
+                x, y = project_arrays(np.array(longitudes), np.array(latitudes))
+                signs = np.array(signs, dtype=np.int64)
+                is_campsite = np.array(types) == 'campsite'
+                cells = cells_across(CLUSTER_MAX_ZOOM)
+                cx = np.minimum((x * cells).astype(np.int64), cells - 1)
+                cy = np.minimum((y * cells).astype(np.int64), cells - 1)
+
+                #each level's cells are the ones below with their numbers halved, so cx >> 1 moves up a level
+                for zoom in range(CLUSTER_MAX_ZOOM, -1, -1):
+                    keys, cell = np.unique(cx * cells_across(zoom) + cy, return_inverse=True)
+                    campsites = np.bincount(cell, weights=signs * is_campsite, minlength=len(keys)).astype(np.int64)
+                    mountains = np.bincount(cell, weights=signs * ~is_campsite, minlength=len(keys)).astype(np.int64)
+                    sum_x = np.bincount(cell, weights=signs * x, minlength=len(keys))
+                    sum_y = np.bincount(cell, weights=signs * y, minlength=len(keys))
+                    key_x, key_y = keys // cells_across(zoom), keys % cells_across(zoom)
+                    rows = list(zip([zoom] * len(keys), key_x.tolist(), key_y.tolist(), campsites.tolist(), mountains.tolist(),
+                                    sum_x.tolist(), sum_y.tolist()))
+
+                    c.executemany("""
+                        INSERT INTO map_clusters VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (zoom, cx, cy) DO UPDATE SET campsites = campsites + excluded.campsites,
+                        mountains = mountains + excluded.mountains, sum_x = sum_x + excluded.sum_x, sum_y = sum_y + excluded.sum_y
+                        """, rows)
+                    #only cells that lost points (or a point added and removed again) can be empty
+                    c.executemany("DELETE FROM map_clusters WHERE zoom = ? AND cx = ? AND cy = ? AND campsites + mountains <= 0",
+                                  [row[:3] for row in rows if row[3] < 0 or row[4] < 0 or row[3] + row[4] == 0])
+                    cx, cy = cx >> 1, cy >> 1
+
+                c.execute("DELETE FROM map_changes WHERE seq <= ?", (changes[-1][0],))
+                applied += len(changes)
+
+    if applied:
+        logger.info(f"Map clusters updated with {applied} change(s).")
+    return applied
+
+
+def view_ranges(west, south, east, north): #the longitude ranges a view covers, split at the 180th meridian
+    if east - west >= 360:
+        return [(-180.0, 180.0)]
+    west = (west + 180) % 360 - 180
+    east = (east + 180) % 360 - 180
+    if west <= east:
+        return [(west, east)]
+    return [(west, 180.0), (-180.0, east)]
+
+def box_points(c, type, west, south, east, north): #the points inside a box, through the R*Tree, with the tooltip fields
+    fields = MAP_FIELDS[type]
+    c.execute(f"""
+        SELECT {type}.id, {type}.longitude, {type}.latitude, {', '.join(f'{type}.{field}' for field in fields)}
+        FROM {type}_rtree JOIN {type} ON {type}.id = {type}_rtree.id
+        WHERE {type}_rtree.max_lon >= ? AND {type}_rtree.min_lon <= ?
+          AND {type}_rtree.max_lat >= ? AND {type}_rtree.min_lat <= ?
+          AND {type}.longitude BETWEEN ? AND ? AND {type}.latitude BETWEEN ? AND ?
+        """, (west, east, south, north, west, east, south, north))
+    return [{'type': type, 'id': row[0], 'lon': row[1], 'lat': row[2], **dict(zip(fields, row[3:]))} for row in c.fetchall()]
+
+def square_points(c, across, sx, sy): #the points in one square of the world (a cluster cell or a tile)
+    """
+    The square's corners are turned back into degrees to search the R*Tree, with a little extra around them since
+    that conversion isn't exact, and then only the points that project into this square are kept.
+    """
+    west, north = unproject(sx / across, sy / across)
+    east, south = unproject((sx + 1) / across, (sy + 1) / across)
+    margin = 1e-7
+    points = []
+    for type in MAP_FIELDS:
+        for point in box_points(c, type, west - margin, south - margin, east + margin, north + margin):
+            if square_of(*project(point['lon'], point['lat']), across) == (sx, sy):
+                points.append(point)
+    return points
+
+def cells_in_range(c, zoom, left, top, right, bottom): #the clusters and points of a block of cells at a zoom level
+    clusters = []
+    points = []
+    c.execute("""
+        SELECT cx, cy, campsites, mountains, sum_x, sum_y FROM map_clusters
+        WHERE zoom = ? AND cx BETWEEN ? AND ? AND cy BETWEEN ? AND ?
+        """, (zoom, left, right, top, bottom))
+    for cx, cy, campsites, mountains, sum_x, sum_y in c.fetchall():
+        count = campsites + mountains
+        if count <= CLUSTER_EXPAND: #few enough to show the points themselves
+            points += square_points(c, cells_across(zoom), cx, cy)
+            continue
+        longitude, latitude = unproject(sum_x / count, sum_y / count)
+        clusters.append({'lon': round(longitude, 5), 'lat': round(latitude, 5), 'count': count,
+                         'campsites': campsites, 'mountains': mountains})
+    return clusters, points
+
+def clusters_in_view(zoom, west, south, east, north):
+    """
+    What the map shows for a view: {'zoom', 'clusters': [{'lon', 'lat', 'count', 'campsites', 'mountains'}],
+    'points': [{'type', 'id', 'lon', 'lat', ...MAP_FIELDS}]}. Clusters are at the average position of their points.
+    """
+    try:
+        zoom = int(zoom)
+        west, south, east, north = (float(value) for value in (west, south, east, north))
+    except (TypeError, ValueError):
+        raise InvalidInputError("Zoom and the view bounds must be numbers.")
+    if zoom < 0 or south > north:
+        raise InvalidInputError("Invalid map view.")
+    south, north = max(-MAX_LATITUDE, south), min(MAX_LATITUDE, north)
+
+    update_clusters()
+
+    clusters = []
+    points = []
+    with database_errors(), db.cursor() as c:
+        for range_west, range_east in view_ranges(west, south, east, north):
+            if zoom > CLUSTER_MAX_ZOOM: #close enough that every point is shown
+                for type in MAP_FIELDS:
+                    points += box_points(c, type, range_west, south, range_east, north)
+                continue
+
+            (left, top), (right, bottom) = cell_of(*project(range_west, north), zoom), cell_of(*project(range_east, south), zoom)
+            range_clusters, range_points = cells_in_range(c, zoom, left, top, right, bottom)
+            clusters += range_clusters
+            points += range_points
+
+    return {'zoom': zoom, 'clusters': clusters, 'points': points}
+
+
+#=== Map Tiles ===
+"""
+The page asks for the map in the same 256 pixel tiles as the background map (zoom/x/y, x from the left and
+y from the top), so a tile it already has never needs asking for again until the data changes.
+A tile is exactly TILE_CELLS x TILE_CELLS cluster cells of its zoom level, so no cluster is cut in two
+or sent twice, and a point on a tile's edge only belongs to the tile it projects into.
+"""
+TILE_CELLS = 256 // CLUSTER_PIXELS #cluster cells across one tile
+MAX_TILE_ZOOM = 22 #past the closest zoom of any background map
+
+def map_tile(zoom, x, y): #the clusters and points in one tile, {'zoom', 'x', 'y', 'clusters', 'points'} like clusters_in_view
+    try:
+        zoom, x, y = int(zoom), int(x), int(y)
+    except (TypeError, ValueError):
+        raise InvalidInputError("Tile zoom, x and y must be whole numbers.")
+    if not 0 <= zoom <= MAX_TILE_ZOOM or not (0 <= x < 2 ** zoom and 0 <= y < 2 ** zoom):
+        raise InvalidInputError(f"There is no tile {zoom}/{x}/{y}.")
+
+    update_clusters()
+
+    with database_errors(), db.cursor() as c:
+        if zoom > CLUSTER_MAX_ZOOM:
+            clusters, points = [], square_points(c, 2 ** zoom, x, y)
+        else:
+            left, top = x * TILE_CELLS, y * TILE_CELLS
+            clusters, points = cells_in_range(c, zoom, left, top, left + TILE_CELLS - 1, top + TILE_CELLS - 1)
+
+    return {'zoom': zoom, 'x': x, 'y': y, 'clusters': clusters, 'points': points}
@@ -0,0 +1,212 @@
+import os
+import sys
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from .schema import update_schema, run_backfills, report_progress
+
+logger = logging.getLogger(__name__)
+
+if getattr(sys, 'frozen', False): #checks if running as exe
+    base_dir = os.path.dirname(sys.executable)
+else:
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) #the project folder, one up from the package
+
+load_dotenv(os.path.join(base_dir, '.env')) #optional settings file in the app's folder, it can set BASECAMP_DB_PATH
+
+#proper pathing for db, BASECAMP_DB_PATH points scripts and servers at another file
+db_path = os.environ.get('BASECAMP_DB_PATH') or os.path.join(base_dir, 'ProjectDatabase.db')
+
+#and the settings file next to the database, when that's somewhere else. settings that are already set
+#(environment variables, then the app folder's .env) aren't overridden
+if os.path.abspath(os.path.dirname(db_path)) != os.path.abspath(base_dir):
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(db_path)), '.env'))
+
+#=== Performance Profiles ===
+"""
+PRAGMA settings applied to every connection the app opens. The profile is picked with the
+BASECAMP_DB_PROFILE setting (environment variable or the .env file), and "balanced" is the default.
+All of them use WAL, so readers (the map, statistics) don't block writers and the other way around.
+  durable:   every commit is synced to disk before it returns, safest if the computer loses power
+  balanced:  syncs at checkpoints only, a power cut can lose the last commits but never corrupts the file
+  bulk-load: no syncing and large caches, for big imports (import_file switches to it on its own)
+"""
+PROFILES = {
+    'durable': {
+        'journal_mode': 'WAL', 'synchronous': 'FULL', 'mmap_size': 0,
+        'cache_size': -8000, 'temp_store': 'DEFAULT', 'busy_timeout': 5000
+    },
+    'balanced': {
+        'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000, 'temp_store': 'MEMORY', 'busy_timeout': 5000
+    },
+    'bulk-load': {
+        'journal_mode': 'WAL', 'synchronous': 'OFF', 'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -256000, 'temp_store': 'MEMORY', 'busy_timeout': 30000
+    }
+}
+DEFAULT_PROFILE = 'balanced'
+
+def selected_profile(): #profile name from the settings, falls back to the default if it's not a known one
+    name = os.environ.get('BASECAMP_DB_PROFILE', DEFAULT_PROFILE).strip().lower()
+    if name not in PROFILES:
+        logger.warning(f"Unknown database profile '{name}', using '{DEFAULT_PROFILE}'.")
+        return DEFAULT_PROFILE
+    return name
+
+def apply_profile(conn, name): #runs the profile's PRAGMAs on a connection (cache_size is in KiB when negative)
+    for pragma, value in PROFILES[name].items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+
+#=== Connection Manager ===
+"""
+sqlite3 connections can only be used by the thread that created them, so instead of one global connection
+every thread gets its own connection from the manager. Each call then opens a short-lived cursor on it.
+The number of open connections is capped so worker threads can't open an unlimited amount of them.
+Nothing is opened until the first query, and the setup function (the schema migrations) runs on that first
+connection, so importing the package never touches the database file. The backfills the migrations leave
+(filling new tables from existing rows) then run on a thread of their own with its own connection, so the
+first query only waits for the schema. backfill_progress and backfill_finished let the app show them.
+"""
+class BackfillStopped(Exception): #raised between batches when the manager is closing, the rest runs next time
+    pass
+
+class ConnectionManager:
+    def __init__(self, path, max_connections=4, timeout=30.0, profile=None, setup=None, backfill=None):
+        self.path = path
+        self.setup = setup #called with the first connection opened, before anything uses it
+        self.ready = setup is None
+        self.setup_lock = threading.Lock()
+        self.backfill = backfill #called with (connection, progress) on its own thread once setup is done
+        self.backfill_thread = None
+        self.backfill_progress = None #called with (task, done, total) after each batch, from the backfill thread
+        self.backfill_finished = None #called with no arguments when the backfill thread ends, from that thread
+        self.stopping = threading.Event() #set by close_all, stops the backfill after its current batch
+        self.profile = profile or selected_profile() #performance profile for new connections
+        self.timeout = timeout #how long to wait for a free connection (and for sqlite locks)
+        self.local = threading.local() #holds the connection of the current thread
+        self.slots = threading.BoundedSemaphore(max_connections) #bounds the pool
+        self.lock = threading.Lock()
+        self.connections = {} #thread -> connection, so they can be cleaned up later
+
+    def connection(self): #returns the connection for the current thread, opening one if needed
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.open()
+        if not self.ready:
+            self.prepare(conn)
+        return conn
+
+    def prepare(self, conn): #runs setup once, other threads wait for it to finish
+        with self.setup_lock:
+            if not self.ready:
+                self.setup(conn)
+                self.ready = True
+                if self.backfill is not None:
+                    self.backfill_thread = threading.Thread(target=self.run_backfill, name="backfill", daemon=True)
+                    self.backfill_thread.start()
+
+    def run_backfill(self): #the backfill thread, its connection goes back to the pool when it's done
+        def step(task, done, total):
+            if self.stopping.is_set():
+                raise BackfillStopped
+            report_progress(self.backfill_progress, task, done, total)
+
+        try:
+            self.backfill(self.connection(), step)
+        except BackfillStopped:
+            logger.info("Backfill stopped, it continues from there next time.")
+        except sqlite3.Error as e: #queries still work off what's filled so far
+            logger.error(f"Backfill failed, it's retried next time: {e}")
+        finally:
+            self.release()
+            if self.backfill_finished is not None:
+                self.backfill_finished()
+
+    def open(self): #opens a new connection for the current thread, waiting for a free slot if the pool is full
+        if not self.slots.acquire(timeout=0): #pool is full, frees connections of threads that have ended
+            self.reap()
+            if not self.slots.acquire(timeout=self.timeout):
+                raise sqlite3.OperationalError("No database connection available.")
+
+        try:
+            #check_same_thread is off only so close_all() can close them at exit, each one is still used by one thread
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            apply_profile(conn, self.profile)
+        except sqlite3.Error:
+            self.slots.release()
+            raise
+
+        self.local.conn = conn
+        with self.lock:
+            self.connections[threading.current_thread()] = conn
+        logger.debug(f"Opened database connection for thread '{threading.current_thread().name}'.")
+        return conn
+
+    def set_profile(self, name): #switches profile, for this thread's connection and any opened after
+        if name not in PROFILES:
+            raise ValueError(f"Unknown database profile: {name}")
+        self.profile = name
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            apply_profile(conn, name)
+        logger.info(f"Database profile set to '{name}'.")
+
+    @contextmanager
+    def profile_override(self, name): #uses another profile on this thread's connection for the duration of a with block
+        conn = self.connection()
+        apply_profile(conn, name)
+        try:
+            yield conn
+        finally:
+            apply_profile(conn, self.profile)
+
+    @contextmanager
+    def cursor(self, commit=False, row_factory=None): #short-lived cursor, commits (or rolls back on error) if commit is True
+        conn = self.connection()
+        cur = conn.cursor()
+        if row_factory is not None: #only this cursor, other calls on the connection still get tuples
+            cur.row_factory = row_factory
+        try:
+            if commit:
+                with conn:
+                    yield cur
+            else:
+                yield cur
+        finally:
+            cur.close()
+
+    def release(self): #closes the current thread's connection (for worker threads once they are done)
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        self.local.conn = None
+        with self.lock:
+            self.connections.pop(threading.current_thread(), None)
+        conn.close()
+        self.slots.release()
+
+    def reap(self): #closes connections owned by threads that no longer exist
+        with self.lock:
+            dead = [thread for thread in self.connections if not thread.is_alive()]
+            for thread in dead:
+                self.connections.pop(thread).close()
+                self.slots.release()
+        if dead:
+            logger.debug(f"Closed {len(dead)} connection(s) left by finished threads.")
+
+    def close_all(self): #closes every connection, used when the application exits
+        self.stopping.set()
+        if self.backfill_thread is not None and self.backfill_thread is not threading.current_thread():
+            self.backfill_thread.join() #lets it finish the batch it's on instead of closing its connection under it
+        with self.lock:
+            for conn in self.connections.values():
+                conn.close()
+                self.slots.release()
+            self.connections.clear()
+        self.local = threading.local()
+        logger.info("All database connections closed.")
+
+db = ConnectionManager(db_path, setup=update_schema, backfill=run_backfills)
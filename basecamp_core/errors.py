@@ -0,0 +1,32 @@
+#=== Errors ===
+"""
+Everything the core raises on purpose is a BasecampError, so a caller only needs one except to catch them.
+error_type is the short label the app shows in front of the message (like "Invalid Input: ...").
+InvalidInputError is also a ValueError and NotFoundError a LookupError, so plain Python code can catch those too.
+"""
+import sqlite3
+from contextlib import contextmanager
+
+
+class BasecampError(Exception):
+    error_type = "Error"
+
+class InvalidInputError(BasecampError, ValueError): #a value the user gave can't be used
+    error_type = "Invalid Input"
+
+class NotFoundError(BasecampError, LookupError): #no item with that name
+    error_type = "Not Found"
+
+class DatabaseError(BasecampError): #sqlite failed, the original error is kept as __cause__
+    error_type = "Database Error"
+
+class FileError(BasecampError): #a file to import/export couldn't be read or written
+    error_type = "File Error"
+
+
+@contextmanager
+def database_errors(): #re-raises sqlite3 errors inside the with block as DatabaseError
+    try:
+        yield
+    except sqlite3.Error as e:
+        raise DatabaseError(f"{e}") from e
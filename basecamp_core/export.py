@@ -0,0 +1,93 @@
+import os
+import csv
+import json
+import logging
+from .connection import db
+from .errors import InvalidInputError, FileError, database_errors
+from .records import columns, validate_type
+from .filtering import filter_query
+
+logger = logging.getLogger(__name__)
+
+#=== Export ===
+"""
+Exports a table, or the results of a sort_and_filter or Query, to CSV, JSON Lines or GeoJSON.
+Rows are pulled from the cursor in batches of EXPORT_ARRAYSIZE and written straight out,
+so memory use is the same for ten rows or ten million.
+"""
+EXPORT_ARRAYSIZE = 1000 #rows fetched from sqlite at a time
+
+def iter_rows(query, params=(), arraysize=EXPORT_ARRAYSIZE): #yields rows lazily instead of fetchall()
+    with db.cursor() as c:
+        c.arraysize = arraysize
+        c.execute(query, params)
+        while True:
+            rows = c.fetchmany()
+            if not rows:
+                return
+            yield from rows
+
+def export_rows(type, column=None, value=None, order='Ascending', query=None): #rows of the table, a sort_and_filter if column is given, or a Query
+    if query is not None:
+        query, params = query.compile()
+    elif column:
+        query, params, column = filter_query(column, value, order, type)
+    else:
+        query, params = f"SELECT * FROM {type} ORDER BY id", []
+    return iter_rows(query, params)
+
+def write_csv(file, fields, rows):
+    writer = csv.writer(file)
+    writer.writerow(fields)
+    count = 0
+    for row in rows:
+        writer.writerow(row[1:]) #leaves out the id
+        count += 1
+    return count
+
+def write_jsonl(file, fields, rows):
+    count = 0
+    for row in rows:
+        file.write(json.dumps(dict(zip(fields, row[1:]))) + '\n')
+        count += 1
+    return count
+
+def write_geojson(file, fields, rows):
+    longitude, latitude = fields.index('longitude'), fields.index('latitude')
+    file.write('{"type": "FeatureCollection", "features": [\n')
+    count = 0
+    for row in rows:
+        values = row[1:]
+        properties = {field: value for i, (field, value) in enumerate(zip(fields, values)) if i not in (longitude, latitude)}
+        if values[longitude] is None or values[latitude] is None:
+            geometry = None
+        else:
+            geometry = {"type": "Point", "coordinates": [values[longitude], values[latitude]]}
+        if count:
+            file.write(',\n')
+        file.write(json.dumps({"type": "Feature", "geometry": geometry, "properties": properties}))
+        count += 1
+    file.write('\n]}\n')
+    return count
+
+writers = {'.csv': write_csv, '.jsonl': write_jsonl, '.geojson': write_geojson}
+
+def export_items(path, type, column=None, value=None, order='Ascending', query=None):
+    """
+    Writes the table (or the sort_and_filter results for column/value/order, or the results of a Query) to path.
+    The format comes from the extension: .csv, .jsonl or .geojson. Returns the number of rows written.
+    """
+    validate_type(type)
+
+    writer = writers.get(os.path.splitext(path)[1].lower())
+    if writer is None:
+        raise InvalidInputError("Unsupported file type, use .csv, .jsonl or .geojson.")
+
+    fields = columns[type][1:]
+    try:
+        with database_errors(), open(path, 'w', newline='', encoding='utf-8') as file:
+            count = writer(file, fields, export_rows(type, column, value, order, query))
+    except OSError as e:
+        raise FileError(f"{e}") from e
+    logger.info(f"Exported {count} {type}s to {path}")
+    return count
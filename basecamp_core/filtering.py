@@ -0,0 +1,320 @@
+import logging
+import re
+from .connection import db
+from .errors import InvalidInputError, database_errors
+from .records import type_map, columns, records, validate_type
+from .cache import cached_query
+
+logger = logging.getLogger(__name__)
+
+SORT_COLUMNS = { #columns that can be sorted by, the ones with an index (plus id)
+    'campsite': ['id', 'name', 'state', 'rating'],
+    'mountain': ['id', 'name', 'state', 'rating', 'elevation', 'ascension', 'time_completed', 'date']
+}
+
+def query_column(type, column): #checks a column name from the user, 'time' is time_completed
+    column = column.strip().lower()
+    if column == 'time':
+        column = 'time_completed'
+    if column not in columns[type]:
+        raise InvalidInputError(f"{column.title()} is not a {type} attribute.")
+    return column
+
+def query_value(type, column, value): #converts a value to what the column holds
+    if isinstance(value, str):
+        value = value.strip()
+
+    if column in type_map[type]['numeric_fields'] or column in ('id', 'longitude', 'latitude'):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise InvalidInputError(f"{column.title()} must be a number.")
+    return value
+
+def collation(column): #text columns that aren't already NOCASE (or have no letters in them) compare with NOCASE
+    return " COLLATE NOCASE" if column in ('description', 'url') else ""
+
+def filter_condition(type, column, value): #builds an equality filter that can use the column's index
+    """
+    Wrapping the column in a function (like LOWER(name)=?) stops sqlite from using an index on it.
+    name and state are already COLLATE NOCASE, so a plain '=' is case insensitive and uses the index.
+    Numbers are compared as numbers and the other text columns use NOCASE on the comparison.
+    """
+    return f"{column} = ?{collation(column)}", query_value(type, column, value)
+
+
+def filter_query(column, value, order, type, after=None, limit=None): #builds the query behind sort_and_filter and its pages
+    if column == 'time':
+        column = 'time_completed'
+    if column not in SORT_COLUMNS[type]: #description, url and the coordinates have no index to sort with
+        raise InvalidInputError("Invalid attribute to sort by.")
+
+    #converts the order value to SQL friendly
+    if order == 'Descending':
+        order = "DESC"
+    else:
+        order = "ASC"
+
+    query = f"SELECT * FROM {type}" #starts with base query then depending on conditions (like value) more stuff is added to the query
+    conditions = []
+    params = [] #for applying filter
+
+    if value: #if value entered, filter
+        condition, param = filter_condition(type, column, value)
+        conditions.append(condition)
+        params.append(param)
+
+    if after: #keyset pagination: continues right after the last row of the previous page
+        direction = '>' if order == 'ASC' else '<'
+        if value: #every row already has the same value in the column, so only the id moves
+            conditions.append(f"id {direction} ?")
+            params.append(after[1])
+        else:
+            conditions.append(f"({column}, id) {direction} (?, ?)")
+            params.extend(after)
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    query += f" ORDER BY {column} {order}, id {order}" #sorts (id breaks ties, the indexes already end with it)
+
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    return query, params, column
+
+
+@cached_query
+def sort_and_filter(column, value, order, type):
+    validate_type(type)
+    query, params, column = filter_query(column, value, order, type)
+
+    with database_errors(), db.cursor(row_factory=records[type]) as c:
+        c.execute(query, params)
+        return c.fetchall() #returns data even if no results
+
+
+PAGE_SIZE = 50 #rows per page on the display tables
+
+@cached_query
+def sort_and_filter_page(column, value, order, type, after=None, page_size=PAGE_SIZE):
+    """
+    Same results as sort_and_filter, one page at a time. Returns the page and a token to pass back as 'after'
+    to get the next one (None once there's nothing left). The token is the sort value and id of the last row,
+    so each page is a seek on the index instead of skipping over rows, and it costs the same however deep it is.
+    """
+    validate_type(type)
+    query, params, column = filter_query(column, value, order, type, after, page_size + 1) #one extra to see if there's more
+
+    with database_errors(), db.cursor(row_factory=records[type]) as c:
+        c.execute(query, params)
+        results = c.fetchall()
+
+    token = None
+    if len(results) > page_size:
+        results = results[:page_size]
+        last = results[-1]
+        token = (getattr(last, column), last.id)
+
+    return results, token
+
+
+#=== Query Builder ===
+"""
+Query builds a filtered, sorted query out of any number of conditions and compiles it into one
+parameterized statement. Each method returns a new Query, so a base query can be reused:
+
+    query = Query('mountain').where('rating', '>=', 4).where('state', 'in', ['Maine', 'Vermont'])
+    query = query.where('elevation', 'between', (3000, 5000)).order_by('elevation', 'Descending').limit(20)
+    results = query.fetch()
+
+Conditions are always "column op ?" with the bare column on the left, so sqlite can use the column's index.
+Sorting is limited to SORT_COLUMNS, and id is always added as the last key so the order is stable.
+"""
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'in', 'between', 'contains')
+
+class Query:
+    def __init__(self, type):
+        validate_type(type)
+        self.type = type
+        self.conditions = () #(SQL, params)
+        self.ordering = () #(column, 'ASC'/'DESC')
+        self.row_limit = None
+        self.row_offset = 0
+
+    def copy(self, **changes):
+        query = Query.__new__(Query)
+        query.__dict__.update(self.__dict__, **changes)
+        return query
+
+    def where(self, column, op, value):
+        column = query_column(self.type, column)
+        op = op.strip().lower()
+
+        if op == 'in':
+            if isinstance(value, str):
+                value = [value]
+            values = [query_value(self.type, column, item) for item in value]
+            if not values:
+                return self.copy(conditions=self.conditions + (("0", []),)) #an empty list matches nothing
+            condition = f"{column} IN ({', '.join(f'?{collation(column)}' for _ in values)})"
+        elif op == 'between':
+            try:
+                low, high = value
+            except (TypeError, ValueError):
+                raise InvalidInputError("Between needs two values.")
+            values = [query_value(self.type, column, low), query_value(self.type, column, high)]
+            condition = f"{column} BETWEEN ?{collation(column)} AND ?{collation(column)}"
+        elif op == 'contains':
+            text = str(value).strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            values = [f"%{text}%"]
+            condition = f"{column} LIKE ? ESCAPE '\\'" #LIKE ignores case already
+        elif op in OPERATORS:
+            values = [query_value(self.type, column, value)]
+            condition = f"{column} {op} ?{collation(column)}"
+        else:
+            raise InvalidInputError(f"Unknown operator {op}, use one of: {', '.join(OPERATORS)}.")
+
+        return self.copy(conditions=self.conditions + ((condition, values),))
+
+    def order_by(self, column, order='Ascending'): #can be called more than once, the first call is the main sort
+        column = query_column(self.type, column)
+        if column not in SORT_COLUMNS[self.type]:
+            raise InvalidInputError(f"Can't sort by {column}.")
+        direction = "DESC" if order in ('Descending', 'DESC', 'desc') else "ASC"
+        return self.copy(ordering=self.ordering + ((column, direction),))
+
+    def limit(self, count, offset=0):
+        try:
+            count, offset = int(count), int(offset)
+        except (TypeError, ValueError):
+            raise InvalidInputError("Limit and offset must be whole numbers.")
+        if count < 0 or offset < 0:
+            raise InvalidInputError("Limit and offset can't be negative.")
+        return self.copy(row_limit=count, row_offset=offset)
+
+    def sort_keys(self): #the ordering with id added last (unless it's already there)
+        keys = list(self.ordering)
+        if 'id' not in (column for column, direction in keys):
+            keys.append(('id', keys[-1][1] if keys else "ASC"))
+        return keys
+
+    def pinned_columns(self): #columns an '=' condition holds to a single value
+        return {condition.split(' ', 1)[0] for condition, values in self.conditions if condition.split(' ')[1:2] == ['=']}
+
+    def compile(self, after=None, select="*"):
+        """
+        Returns (SQL, params). after is the sort values of the last row of the previous page (see page()),
+        and only works when every sort key goes the same direction.
+        """
+        conditions = [condition for condition, values in self.conditions]
+        params = [value for condition, values in self.conditions for value in values]
+        keys = self.sort_keys()
+
+        if after is not None:
+            direction = '>' if keys[0][1] == "ASC" else '<'
+            #leading keys an '=' condition holds to one value are the same on every row, so they're left out and
+            #sqlite can seek on the rest (name = ? AND id > ? is a range on the name index, the row value isn't)
+            pinned = self.pinned_columns()
+            skip = 0
+            while skip < len(keys) and keys[skip][0] in pinned:
+                skip += 1
+            seek, after = keys[skip:], list(after)[skip:]
+            if len(seek) == 1:
+                conditions.append(f"{seek[0][0]} {direction} ?")
+            elif seek: #every key pinned (like id = ?) leaves nothing to continue after
+                conditions.append(f"({', '.join(column for column, order in seek)}) {direction} ({', '.join('?' * len(seek))})")
+            params.extend(after)
+
+        sql = f"SELECT {select} FROM {self.type}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY " + ", ".join(f"{column} {order}" for column, order in keys)
+        if self.row_limit is not None or self.row_offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if self.row_limit is None else self.row_limit, self.row_offset])
+        return sql, params
+
+    def fetch(self): #all the results, as records
+        return run_query(self.type, *self.compile())
+
+    def count(self): #how many rows match, ignoring limit/offset
+        sql, params = self.copy(row_limit=None, row_offset=0, ordering=()).compile(select="COUNT(*)")
+        return run_query(self.type, sql, params, as_records=False)[0][0]
+
+    def page(self, after=None, page_size=PAGE_SIZE):
+        """
+        Same as sort_and_filter_page: returns a page and a token for the next one (None at the end).
+        When every sort key goes the same direction the token is the last row's sort values, so each page is
+        a seek on the index. Otherwise it falls back to an offset.
+        """
+        keys = self.sort_keys()
+        keyset = len({order for column, order in keys}) == 1 and self.row_limit is None and not self.row_offset
+        if keyset:
+            sql, params = self.copy(row_limit=page_size + 1).compile(after) #one extra to see if there's more
+        else:
+            offset = self.row_offset + (after or 0)
+            sql, params = self.copy(row_limit=page_size + 1, row_offset=offset).compile()
+        results = run_query(self.type, sql, params)
+
+        token = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            if keyset:
+                token = tuple(getattr(results[-1], column) for column, order in keys)
+            else:
+                token = (after or 0) + page_size
+        return results, token
+
+
+@cached_query
+def run_query(type, sql, params, as_records=True): #runs a compiled Query
+    with database_errors(), db.cursor(row_factory=records[type] if as_records else None) as c:
+        c.execute(sql, params)
+        return c.fetchall()
+
+
+#matches one condition of a filter expression: a value is quoted, or words up to the next "and"
+VALUE = r"""(?:"[^"]*"|'[^']*'|[^\s,()"']+(?:\s+(?!and\b)[^\s,()"']+)*)"""
+CONDITION = re.compile(rf"""\s*(?P<column>\w+)\s*(?:
+    (?P<op>>=|<=|!=|=|<|>)\s*(?P<value>{VALUE})
+    |(?P<between>between)\s+(?P<low>{VALUE})\s+and\s+(?P<high>{VALUE})
+    |(?P<in>in)\s*\((?P<values>[^)]*)\)
+    |(?P<contains>contains)\s+(?P<text>{VALUE})
+    )\s*(?P<end>and\b|$)""", re.IGNORECASE | re.VERBOSE)
+
+def unquote(value):
+    value = value.strip()
+    if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+def looks_like_filter(text): #True if text is a filter expression rather than a plain value
+    return CONDITION.match(text) is not None
+
+def parse_filter(type, text, query=None):
+    """
+    Turns a filter typed on the display page into a Query, like:
+        rating >= 4 and state in (Maine, "New Hampshire") and elevation between 3000 and 5000
+    Conditions are joined with "and". Operators: = != < <= > >= in between contains.
+    """
+    query = query or Query(type)
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = CONDITION.match(text, position)
+        if match is None:
+            raise InvalidInputError(f"Can't read the filter at: '{text[position:]}'.")
+        column = match.group('column')
+        if match.group('op'):
+            query = query.where(column, match.group('op'), unquote(match.group('value')))
+        elif match.group('between'):
+            query = query.where(column, 'between', (unquote(match.group('low')), unquote(match.group('high'))))
+        elif match.group('in'):
+            values = [unquote(value) for value in match.group('values').split(',') if value.strip()]
+            query = query.where(column, 'in', values)
+        else:
+            query = query.where(column, 'contains', unquote(match.group('text')))
+        position = match.end()
+    return query
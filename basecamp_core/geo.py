@@ -0,0 +1,135 @@
+import math
+import logging
+import threading
+from .connection import db
+from .errors import NotFoundError, database_errors
+from .records import records, validate_type
+from .cache import change_counter
+
+logger = logging.getLogger(__name__)
+
+#=== Location Queries ===
+EARTH_RADIUS_KM = 6371.0088 #mean radius of the earth
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180 #length of one degree of latitude
+
+def haversine_km(latitude_1, longitude_1, latitude_2, longitude_2): #distance along the earth's surface
+    lat_1, lat_2 = math.radians(latitude_1), math.radians(latitude_2)
+    d_lat = lat_2 - lat_1
+    d_lon = math.radians(longitude_2 - longitude_1)
+    a = math.sin(d_lat / 2) ** 2 + math.cos(lat_1) * math.cos(lat_2) * math.sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bbox_rows(c, type, min_lon, min_lat, max_lon, max_lat): #records inside a box, found through the R*Tree
+    """
+    The R*Tree stores 32 bit floats and rounds boxes outwards, so it can return points slightly outside the box.
+    The BETWEEN on the real columns removes those.
+    """
+    c.execute(f"""
+        SELECT {type}.* FROM {type}_rtree JOIN {type} ON {type}.id = {type}_rtree.id
+        WHERE {type}_rtree.max_lon >= ? AND {type}_rtree.min_lon <= ?
+          AND {type}_rtree.max_lat >= ? AND {type}_rtree.min_lat <= ?
+          AND {type}.longitude BETWEEN ? AND ? AND {type}.latitude BETWEEN ? AND ?
+        """, (min_lon, max_lon, min_lat, max_lat, min_lon, max_lon, min_lat, max_lat))
+    return c.fetchall()
+
+def items_in_bbox(type, min_lon, min_lat, max_lon, max_lat): #every row with coordinates inside the box
+    validate_type(type)
+
+    with database_errors(), db.cursor(row_factory=records[type]) as c:
+        if min_lon <= max_lon:
+            return bbox_rows(c, type, min_lon, min_lat, max_lon, max_lat)
+        #the box crosses the 180th meridian, so it's split into the parts either side of it
+        return bbox_rows(c, type, min_lon, min_lat, 180.0, max_lat) + bbox_rows(c, type, -180.0, min_lat, max_lon, max_lat)
+
+def items_within_radius(type, longitude, latitude, radius_km): #(distance in km, record) for rows within radius_km, closest first
+    validate_type(type)
+
+    #box around the circle: degrees of longitude shrink towards the poles
+    d_lat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, latitude - d_lat), min(90.0, latitude + d_lat)
+    cos_lat = min(math.cos(math.radians(min_lat)), math.cos(math.radians(max_lat)))
+    if cos_lat <= 0 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180: #reaches a pole, every longitude is in range
+        min_lon, max_lon = -180.0, 180.0
+    else:
+        d_lon = radius_km / (KM_PER_DEGREE * cos_lat)
+        min_lon = (longitude - d_lon + 180) % 360 - 180 #wraps around the 180th meridian
+        max_lon = (longitude + d_lon + 180) % 360 - 180
+
+    results = []
+    for item in items_in_bbox(type, min_lon, min_lat, max_lon, max_lat): #the box corners are further than the radius
+        distance = haversine_km(latitude, longitude, item.latitude, item.longitude)
+        if distance <= radius_km:
+            results.append((distance, item))
+
+    results.sort(key=lambda result: result[0])
+    return results
+
+
+#=== Nearest Neighbours ===
+"""
+The coordinates of a table are loaded once into NumPy arrays and kept until the change counter moves.
+A nearest search is then one vectorized haversine pass over every point plus a partial sort for the top k,
+which takes a few milliseconds even with 100k rows.
+"""
+coordinate_cache = {} #type -> (change counter, ids, latitudes, longitudes) with the angles in radians
+coordinate_lock = threading.Lock()
+
+def coordinate_arrays(type): #ids and coordinates (radians) of every row that has coordinates
+    import numpy as np #only loaded once a nearest search runs, it's slow to import
+    counter = change_counter()
+    with coordinate_lock:
+        cached = coordinate_cache.get(type)
+        if cached and cached[0] == counter:
+            return cached[1:]
+
+    with db.cursor() as c:
+        c.execute(f"SELECT id, latitude, longitude FROM {type} WHERE latitude IS NOT NULL AND longitude IS NOT NULL")
+        rows = np.array(c.fetchall(), dtype=np.float64).reshape(-1, 3)
+
+    arrays = (rows[:, 0].astype(np.int64), np.radians(rows[:, 1]), np.radians(rows[:, 2]))
+    with coordinate_lock:
+        coordinate_cache[type] = (counter, *arrays)
+    return arrays
+
+def nearest(type, latitude, longitude, k=10, exclude_id=None): #[(distance in km, record)] of the k closest rows
+    import numpy as np
+    validate_type(type)
+
+    with database_errors():
+        ids, latitudes, longitudes = coordinate_arrays(type)
+        if exclude_id is not None: #so an item isn't listed as being near itself
+            keep = ids != exclude_id
+            ids, latitudes, longitudes = ids[keep], latitudes[keep], longitudes[keep]
+        if len(ids) == 0 or k <= 0:
+            return []
+
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        a = np.sin((latitudes - lat) / 2) ** 2 + math.cos(lat) * np.cos(latitudes) * np.sin((longitudes - lon) / 2) ** 2
+        distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+        k = min(k, len(ids))
+        closest = np.argpartition(distances, k - 1)[:k] #the k smallest, unordered
+        closest = closest[np.argsort(distances[closest])]
+
+        closest_ids = [int(i) for i in ids[closest]]
+        with db.cursor(row_factory=records[type]) as c:
+            c.execute(f"SELECT * FROM {type} WHERE id IN ({','.join('?' * len(closest_ids))})", closest_ids)
+            items = {item.id: item for item in c.fetchall()}
+
+    return [(float(distances[i]), items[item_id]) for i, item_id in zip(closest, closest_ids) if item_id in items]
+
+def nearest_to_item(name, from_type, type, k=10): #the k closest rows of 'type' to the item called name
+    validate_type(from_type)
+    validate_type(type)
+
+    with database_errors(), db.cursor() as c:
+        c.execute(f"SELECT id, latitude, longitude FROM {from_type} WHERE name=? AND latitude IS NOT NULL AND longitude IS NOT NULL",
+                  (name.strip(),))
+        item = c.fetchone()
+
+    if item is None:
+        raise NotFoundError(f"No {from_type} with coordinates found with name: {name}.")
+
+    item_id, latitude, longitude = item
+    exclude_id = item_id if from_type == type else None
+    return nearest(type, latitude, longitude, k, exclude_id)
@@ -0,0 +1,176 @@
+import os
+import re
+import csv
+import json
+import sqlite3
+import logging
+import xml.etree.ElementTree as ET
+from .connection import db
+from .errors import InvalidInputError
+from .records import type_map, validate_type, validate_item
+from .backup import backups
+
+logger = logging.getLogger(__name__)
+
+#=== Bulk Import ===
+"""
+Imports rows from CSV, GeoJSON or GPX files. Files are read one row at a time, each row goes through the same
+checks as create_item but problems are collected in a report instead of being raised, and valid rows are inserted
+with executemany in chunks, one transaction per chunk. One backup is made before anything is written.
+
+CSV:     a header row using the column names of the table (time or time_completed both work).
+GeoJSON: Point features, the coordinates come from the geometry and everything else from the properties.
+GPX:     waypoints, using name, desc, link and the table's column names inside <extensions>.
+"""
+IMPORT_CHUNK_SIZE = 5000 #rows per transaction
+
+insert_statements = {
+    'campsite': """INSERT INTO campsite (name, state, rating, description, url, longitude, latitude)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+    'mountain': """INSERT INTO mountain (name, state, rating, elevation, ascension, time_completed, description, date, url, longitude, latitude)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+}
+
+def record_to_info(type, record): #turns a dict of field -> value into the info list create_item uses
+    if 'time_completed' in record and 'time' not in record:
+        record['time'] = record['time_completed']
+    info = []
+    for field in type_map[type]['fieldnames']:
+        value = record.get(field)
+        info.append('' if value is None else str(value))
+    return info
+
+def read_csv(path): #yields dicts, one per row
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        for row in csv.DictReader(file):
+            yield {key.strip().lower(): value for key, value in row.items() if key}
+
+def read_geojson(path, chunk_size=65536): #yields dicts, one per feature, without loading the whole file
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as file:
+        buffer = ''
+        while True: #finds the start of the features list
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            match = re.search(r'"features"\s*:\s*\[', buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            buffer = buffer[-32:] #keeps the end in case the key was cut in half
+
+        while True: #decodes one feature at a time, reading more of the file when one is cut off
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise ValueError("GeoJSON file ended in the middle of a feature.")
+                buffer += chunk
+                continue
+            buffer = buffer[end:]
+
+            record = {key.lower(): value for key, value in (feature.get('properties') or {}).items()}
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Point' and len(geometry.get('coordinates') or []) >= 2:
+                record['longitude'], record['latitude'] = geometry['coordinates'][:2]
+            yield record
+
+def read_gpx(path): #yields dicts, one per waypoint, clearing each one once read
+    context = ET.iterparse(path, events=('start', 'end'))
+    root = None
+    for event, element in context:
+        if root is None:
+            root = element
+        if event != 'end' or element.tag.rsplit('}', 1)[-1] != 'wpt':
+            continue
+
+        record = {'latitude': element.get('lat'), 'longitude': element.get('lon')}
+        for child in element:
+            tag = child.tag.rsplit('}', 1)[-1].lower()
+            text = (child.text or '').strip()
+            if tag == 'name':
+                record['name'] = text
+            elif tag == 'desc':
+                record['description'] = text
+            elif tag == 'link' and child.get('href'):
+                record['url'] = child.get('href')
+            elif tag == 'time' and text: #timestamp of the waypoint, used as the date
+                record['date'] = text[:10]
+            elif tag == 'ele' and text: #gpx elevation is in meters, the app uses feet
+                try:
+                    record['elevation'] = round(float(text) * 3.28084)
+                except ValueError:
+                    record['elevation'] = text #left as is so it gets reported
+            elif tag == 'extensions': #app specific fields, these override the standard ones
+                for extension in child.iter():
+                    name = extension.tag.rsplit('}', 1)[-1].lower()
+                    if extension is not child and extension.text and extension.text.strip():
+                        record[name] = extension.text.strip()
+        yield record
+        root.clear() #drops waypoints that have been read so memory stays flat
+
+readers = {'.csv': read_csv, '.geojson': read_geojson, '.json': read_geojson, '.gpx': read_gpx}
+
+def import_file(path, type, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Imports every row of a file into the table. Returns a report:
+    {'rows': rows read, 'inserted': rows saved, 'errors': [(row number, problem), ...]}
+    progress is called with the number of rows read every chunk_size rows.
+    An invalid type or an unsupported file raises InvalidInputError before anything is read.
+    """
+    validate_type(type)
+    reader = readers.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise InvalidInputError("Unsupported file type, use .csv, .geojson or .gpx.")
+
+    report = {'rows': 0, 'inserted': 0, 'errors': []}
+
+    backups.backup_now() #one backup before the whole import instead of one per row
+    statement = insert_statements[type]
+
+    def insert_chunk(c, chunk): #chunk is a list of (row number, values)
+        try:
+            with c.connection:
+                c.executemany(statement, [values for number, values in chunk])
+            report['inserted'] += len(chunk)
+        except sqlite3.IntegrityError: #something slipped past the checks, retries row by row to find it
+            for number, values in chunk:
+                try:
+                    with c.connection:
+                        c.execute(statement, values)
+                    report['inserted'] += 1
+                except sqlite3.IntegrityError as e:
+                    report['errors'].append((number, f"Integrity Error: {e}"))
+
+    try:
+        with db.profile_override('bulk-load'), db.cursor() as c:
+            chunk = []
+            for number, record in enumerate(reader(path), 1):
+                report['rows'] = number
+                try:
+                    chunk.append((number, validate_item(type, record_to_info(type, record))))
+                except InvalidInputError as e:
+                    report['errors'].append((number, f"{e}"))
+
+                if len(chunk) >= chunk_size:
+                    insert_chunk(c, chunk)
+                    chunk = []
+                if progress and number % chunk_size == 0: #counted by rows read, so a file of bad rows still reports (and can be cancelled)
+                    progress(number)
+
+            if chunk:
+                insert_chunk(c, chunk)
+            if progress: progress(report['rows'])
+
+    except (OSError, ValueError, ET.ParseError, csv.Error) as e: #problems with the file itself stop the import
+        report['errors'].append((report['rows'] + 1, f"File Error: {e}"))
+    except sqlite3.Error as e:
+        report['errors'].append((report['rows'], f"Database Error: {e}"))
+
+    logger.info(f"Imported {report['inserted']} of {report['rows']} {type}s from {path}, {len(report['errors'])} problem(s).")
+    return report
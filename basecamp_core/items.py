@@ -0,0 +1,190 @@
+import json
+import logging
+from datetime import datetime
+from .connection import db
+from .errors import InvalidInputError, NotFoundError, database_errors
+from .records import records, US_States, validate_type, validate_item, validate_value
+from .backup import backups, create_backup
+from .cache import cached_query
+
+logger = logging.getLogger(__name__)
+
+
+def insert_campsite(name, state, rating, description, url, longitude, latitude):
+    with database_errors(), db.cursor(commit=True) as c: #commits the function in the with statement
+        c.execute("""INSERT INTO campsite (name, state, rating, description, url, longitude, latitude)
+        VALUES (:name, :state, :rating, :description, :url, :longitude, :latitude)""",
+                  {'name': name, 'state': state, 'rating': rating, 'description': description, 'url': url, 'longitude': longitude, 'latitude': latitude})
+
+def insert_mountain(name, state, rating, elevation, ascension, time_completed, description, date, url, longitude, latitude):
+    with database_errors(), db.cursor(commit=True) as c:
+        c.execute("""INSERT INTO mountain (name, state, rating, elevation, ascension, time_completed, description, date, url, longitude, latitude)
+        VALUES (:name, :state, :rating, :elevation, :ascension, :time_completed, :description, :date, :url, :longitude, :latitude)""",
+                  {'name': name, 'state': state, 'rating': rating, 'elevation': elevation, 'ascension': ascension, 'time_completed': time_completed, 'description': description,'date':date, 'url': url, 'longitude': longitude, 'latitude': latitude})
+
+def create_item(type, info): #inputs for campsite/mountain information, raises InvalidInputError if something is wrong
+    validate_type(type) #checks the type
+    if not info:
+        raise InvalidInputError("Missing info.")
+
+    values = validate_item(type, info)
+
+    create_backup()
+
+    if type == 'mountain':
+        #adding mountain to database
+        insert_mountain(*values)
+
+    elif type == 'campsite':
+        #adding campsite to database
+        insert_campsite(*values)
+
+    logger.info(f'{type.capitalize()}: {values[0]} is saved\n')
+    return True
+
+def remove_item(name, type): #removes item from database, raises NotFoundError if there's none with that name
+    validate_type(type) #checking type
+
+    name = name.strip()
+    if not name:
+        raise InvalidInputError("Name cannot be empty.")
+
+    create_backup()
+
+    with database_errors(), db.cursor(commit=True) as c:
+        c.execute(f"DELETE FROM {type} WHERE name=?", (name,))
+        deleted = c.rowcount
+
+    if deleted == 0: #checks if any rows were affected (aka if it worked)
+        raise NotFoundError(f"No {type} has been found with name: '{name}'.")
+    logger.info(f'{type.capitalize()}: {name} has been removed\n')
+    return True
+
+
+@cached_query
+def item_search(name, type):
+    validate_type(type)
+
+    name = name.strip()
+    if not name:
+        raise InvalidInputError("Name cannot be empty.")
+
+    with database_errors(), db.cursor(row_factory=records[type]) as c:
+        c.execute(f"SELECT * FROM {type} WHERE name=?", (name,))
+        results = c.fetchall()
+
+    if not results:
+        logger.info(f"No {type} has been found with name '{name}'\n")
+    return results #returns the data (as a list of records), empty if no results found
+
+def replace_info(name, type, column, new_value): #updates info from a column, raises NotFoundError if there's no item with that name
+    validate_type(type)
+
+    if not name: #checks for empty name
+        raise InvalidInputError("Name cannot be empty.")
+
+    column, new_value = validate_value(type, column, new_value) #input error handling
+
+    create_backup()
+
+    with database_errors(), db.cursor(commit=True) as c:
+        c.execute(f"UPDATE {type} SET {column}=? WHERE name =?", (new_value, name))
+        updated = c.rowcount
+
+    if updated == 0:
+        raise NotFoundError(f"No {type} found with name: {name}.")
+    logger.info(f'{type.capitalize()} {name}: {column.capitalize()} has been updated to {new_value}\n')
+    return True
+
+
+#=== Bulk Changes ===
+"""
+update_matching and delete_matching change every row that matches a filter with a single UPDATE/DELETE,
+in one transaction, after one backup. A filter is any mix of:
+  states:      list of state names
+  rating:      (low, high), either end can be None to leave it open
+  date_range:  ('YYYY-MM-DD', 'YYYY-MM-DD'), mountains only, either end can be None
+  ids:         list of row ids
+All of the given parts have to match. At least one is needed, so a missing filter can't change the whole table.
+"""
+def matching_condition(type, states=None, rating=None, date_range=None, ids=None): #builds the WHERE clause of a bulk change
+    conditions = []
+    params = []
+
+    if states is not None:
+        states = [state.strip().title() for state in states]
+        for state in states:
+            if state not in US_States:
+                raise InvalidInputError(f"{state} is not a valid US state.")
+        if states:
+            conditions.append(f"state IN ({', '.join('?' * len(states))})") #state is NOCASE, so IN uses the index
+            params.extend(states)
+        else:
+            conditions.append("0") #an empty list matches nothing
+
+    if rating is not None:
+        try:
+            low, high = (None if value is None else float(value) for value in rating)
+        except (TypeError, ValueError):
+            raise InvalidInputError("Rating range must be numbers.")
+        if low is not None:
+            conditions.append("rating >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("rating <= ?")
+            params.append(high)
+
+    if date_range is not None:
+        if type != 'mountain':
+            raise InvalidInputError("Only mountains have a date.")
+        low, high = date_range
+        for value in (low, high):
+            if value is not None:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except (TypeError, ValueError):
+                    raise InvalidInputError("Please enter a valid date. Date must be in YYYY-MM-DD format.")
+        if low is not None:
+            conditions.append("date >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("date <= ?")
+            params.append(high)
+
+    if ids is not None:
+        try:
+            ids = [int(item_id) for item_id in ids]
+        except (TypeError, ValueError):
+            raise InvalidInputError("Ids must be whole numbers.")
+        #one parameter however many ids there are, sqlite looks each one up by rowid
+        conditions.append("id IN (SELECT value FROM json_each(?))")
+        params.append(json.dumps(ids))
+
+    if not conditions:
+        raise InvalidInputError("A filter is needed for a bulk change.")
+    return " AND ".join(conditions), params
+
+def update_matching(type, column, new_value, **where): #sets column to new_value on every matching row, returns how many changed
+    validate_type(type)
+    condition, params = matching_condition(type, **where)
+    column, new_value = validate_value(type, column, new_value) #same checks as replace_info
+
+    backups.backup_now() #one backup before the change, rather than one per row
+    with database_errors(), db.cursor(commit=True) as c:
+        c.execute(f"UPDATE {type} SET {column}=? WHERE {condition}", [new_value, *params])
+        updated = c.rowcount
+
+    logger.info(f"Bulk update: {column} set to {new_value} on {updated} {type}(s).")
+    return updated
+
+def delete_matching(type, **where): #deletes every matching row, returns how many were deleted
+    validate_type(type)
+    condition, params = matching_condition(type, **where)
+
+    backups.backup_now()
+    with database_errors(), db.cursor(commit=True) as c:
+        c.execute(f"DELETE FROM {type} WHERE {condition}", params)
+        deleted = c.rowcount
+
+    logger.info(f"Bulk delete: {deleted} {type}(s) removed.")
+    return deleted
@@ -0,0 +1,323 @@
+import os
+import json
+import tempfile
+import contextlib
+import logging
+from .connection import db_path, base_dir
+from .errors import FileError
+
+logger = logging.getLogger(__name__)
+
+#=== Map Cache ===
+"""
+The map page doesn't hold any data (it asks the local server for it, see clusters.py), so it only has to be
+made again when MAP_SETTINGS or the way it's drawn (MAP_VERSION) changed. The meta file next to the database
+remembers what the current main_map.html was built with, so the page is reused across visits and restarts.
+The file's size and modified time are kept too, so a main_map.html that was deleted or changed isn't reused.
+"""
+MAP_SETTINGS = {
+    'location': [39.8283, -98.5795],
+    'zoom_start': 5,
+    # 'tiles': 'https://tiles.stadiamaps.com/tiles/outdoors/{z}/{x}/{y}{r}.png',
+    'tiles': "OpenStreetMap",
+    'attr': "Stadia.Outdoors",
+    'prefer_canvas': True
+}
+MAP_VERSION = 5 #bump when make_main_map draws the map differently, so old files get rebuilt
+map_path = os.path.join(base_dir, 'main_map.html') #where the local server sends it from
+meta_path = os.path.splitext(db_path)[0] + '_map.json'
+
+def map_stamp(): #what the current map has to have been built from
+    return {'version': MAP_VERSION, 'settings': MAP_SETTINGS}
+
+def file_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def map_is_current(stamp):
+    try:
+        with open(meta_path, encoding='utf-8') as file:
+            meta = json.load(file)
+        return meta.get('stamp') == json.loads(json.dumps(stamp)) and meta.get('file') == file_stamp(map_path)
+    except (OSError, ValueError): #no meta file yet, or a damaged one
+        return False
+
+def replace_file(path, text):
+    """
+    Writes text to a temporary file of its own next to path and then moves it into place, so nothing ever reads
+    half a file, and two builds writing at once (a cancelled one that hasn't stopped yet) can't mix their files.
+    """
+    file = tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path) or None,
+                                       prefix=os.path.basename(path) + '.', suffix='.tmp', delete=False)
+    try:
+        with file:
+            file.write(text)
+        os.replace(file.name, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(file.name)
+        raise
+
+def save_map_meta(stamp):
+    try:
+        replace_file(meta_path, json.dumps({'stamp': stamp, 'file': file_stamp(map_path)}))
+    except OSError as e: #the map is fine, it just gets rebuilt next time
+        logger.warning(f"Couldn't save the map cache info: {e}")
+
+#=== Map Layer ===
+"""
+The page asks /api/tiles for the tiles in view (clusters and points, see clusters.py) and draws them on a
+single canvas. Tiles it already has are kept, up to TILE_CACHE of them, so moving back over them doesn't ask
+again, and only the new ones are fetched when the map moves. Hovering a point shows one shared tooltip filled
+from TOOLTIP_TEMPLATES with the values HTML escaped, clicking it shows the name, and clicking a cluster zooms
+in on it. basecampRefresh() forgets the kept tiles and asks again, for when the data has changed.
+"""
+MAP_FIELDS = { #columns sent to the page for the tooltips
+    'campsite': ['name', 'rating', 'description'],
+    'mountain': ['name', 'rating', 'elevation', 'ascension', 'description']
+}
+MAP_STYLES = {'campsite': {'color': "#3a8a3a", 'radius': 5}, 'mountain': {'color': "#666666", 'radius': 5},
+              'cluster': {'color': "#2a6f97", 'radius': 12}}
+TOOLTIP_TEMPLATES = { #{field} is replaced with the escaped value
+    'campsite': """<span style="font-size:14px; font-weight:bold;">{name}</span><br>
+        <b>Rating:</b> {rating} <br>
+        <b>Description:</b><br>
+        <p>{description}</p>""",
+    'mountain': """<span style="font-size:14px; font-weight:bold;">{name}</span><br>
+        <b>Rating:</b> {rating} <br>
+        <b>Elevation:</b> {elevation} <br>
+        <b>Ascension:</b> {ascension} <br>
+        <b>Description:</b><br>
+        <p>{description}</p>""",
+    'cluster': """<b>{count}</b> places<br>{campsites} campsites, {mountains} mountains"""
+}
+TILES_URL = "/api/tiles"
+TILE_CACHE = 1024 #tiles the page keeps, the least recently seen go first
+
+def script_json(value): #JSON that's safe inside a <script> tag
+    return json.dumps(value, separators=(',', ':')).replace('</', '<\\/').replace('<!--', '<\\!--')
+
+MAP_SCRIPT = """
+(function () {
+    var map = __MAP__;
+    var styles = __STYLES__, templates = __TEMPLATES__, url = __URL__, cacheSize = __CACHE__;
+    var items = []; //what's drawn for the current view
+    var tiles = new Map(); //"zoom/x/y" -> the tile's items, oldest first
+    var pending = new Set(); //tiles being asked for
+    var generation = 0; //goes up when the data changes, so answers from before are dropped
+
+    function escapeHtml(value) {
+        if (value === null || value === undefined) return "";
+        return String(value).replace(/[&<>"']/g, function (ch) {
+            return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[ch];
+        });
+    }
+    function render(item) {
+        return templates[item.type].replace(/\\{(\\w+)\\}/g, function (match, field) {
+            return escapeHtml(item[field]);
+        });
+    }
+    function radius(item) { //clusters grow with the log of their size
+        var style = styles[item.type];
+        return item.type === "cluster" ? style.radius + 3 * Math.log10(item.count) : style.radius;
+    }
+
+    var CELL = 16; //hit testing grid, in screen pixels
+    function cellKey(cx, cy) { return (cx + 2) * 65536 + cy + 2; } //numbers are quicker keys than strings
+    var PointLayer = L.Layer.extend({
+        onAdd: function (map) {
+            this.canvas = L.DomUtil.create("canvas", "leaflet-zoom-hide");
+            map.getPanes().overlayPane.appendChild(this.canvas);
+            map.on("resize", this.redraw, this);
+            map.on("zoomstart", this.clear, this);
+            this.redraw();
+        },
+        onRemove: function (map) {
+            L.DomUtil.remove(this.canvas);
+            map.off("resize", this.redraw, this);
+            map.off("zoomstart", this.clear, this);
+        },
+        clear: function () {
+            this.canvas.getContext("2d").clearRect(0, 0, this.canvas.width, this.canvas.height);
+        },
+        redraw: function () {
+            var size = map.getSize(), ratio = window.devicePixelRatio || 1;
+            this.canvas.width = size.x * ratio;
+            this.canvas.height = size.y * ratio;
+            this.canvas.style.width = size.x + "px";
+            this.canvas.style.height = size.y + "px";
+            L.DomUtil.setPosition(this.canvas, map.containerPointToLayerPoint([0, 0]));
+
+            var context = this.canvas.getContext("2d");
+            context.setTransform(ratio, 0, 0, ratio, 0, 0);
+            context.font = "bold 11px sans-serif";
+            context.textAlign = "center";
+            context.textBaseline = "middle";
+            var grid = this.grid = new Map();
+            items.forEach(function (item) {
+                var point = map.latLngToContainerPoint([item.lat, item.lon]), r = radius(item);
+                item.x = point.x;
+                item.y = point.y;
+                context.beginPath();
+                context.arc(point.x, point.y, r, 0, 2 * Math.PI);
+                context.fillStyle = styles[item.type].color;
+                context.globalAlpha = 0.85;
+                context.fill();
+                context.globalAlpha = 1;
+                context.strokeStyle = "#ffffff";
+                context.lineWidth = item.type === "cluster" ? 2 : 1;
+                context.stroke();
+                if (item.type === "cluster") {
+                    context.fillStyle = "#ffffff";
+                    context.fillText(item.count >= 10000 ? Math.round(item.count / 1000) + "k" : item.count, point.x, point.y);
+                }
+                var key = cellKey(Math.floor(point.x / CELL), Math.floor(point.y / CELL));
+                var cell = grid.get(key);
+                if (cell) cell.push(item); else grid.set(key, [item]);
+            });
+        },
+        itemAt: function (point) { //the item under the mouse, points before clusters
+            var best = null, bestDistance = Infinity;
+            var cx = Math.floor(point.x / CELL), cy = Math.floor(point.y / CELL);
+            for (var dx = -2; dx <= 2; dx++) {
+                for (var dy = -2; dy <= 2; dy++) {
+                    (this.grid.get(cellKey(cx + dx, cy + dy)) || []).forEach(function (item) {
+                        var distance = Math.sqrt(Math.pow(item.x - point.x, 2) + Math.pow(item.y - point.y, 2));
+                        if (distance <= radius(item) + 2 && distance < bestDistance) { best = item; bestDistance = distance; }
+                    });
+                }
+            }
+            return best;
+        }
+    });
+    var layer = new PointLayer().addTo(map);
+
+    function visibleTiles() { //[zoom, x, y, world] of each tile in view, x wrapped into the world it's a copy of
+        var zoom = Math.round(map.getZoom()), across = Math.pow(2, zoom), bounds = map.getPixelBounds(), result = [];
+        var top = Math.max(0, Math.floor(bounds.min.y / 256)), bottom = Math.min(across - 1, Math.floor(bounds.max.y / 256));
+        for (var x = Math.floor(bounds.min.x / 256); x <= Math.floor(bounds.max.x / 256); x++) {
+            var wrapped = ((x % across) + across) % across;
+            for (var y = top; y <= bottom; y++) result.push([zoom, wrapped, y, (x - wrapped) / across]);
+        }
+        return result;
+    }
+    function show() { //draws the kept tiles that are in view
+        items = [];
+        visibleTiles().forEach(function (tile) {
+            var key = tile.slice(0, 3).join("/"), tileItems = tiles.get(key);
+            if (!tileItems) return;
+            tiles.delete(key); //seen again, so it's now the newest
+            tiles.set(key, tileItems);
+            tileItems.forEach(function (item) {
+                items.push(tile[3] ? Object.assign({}, item, {lon: item.lon + 360 * tile[3]}) : item);
+            });
+        });
+        layer.redraw();
+    }
+    function fetchTile(key) {
+        var number = generation;
+        pending.add(key);
+        var parts = key.split("/");
+        fetch(url + "?zoom=" + parts[0] + "&x=" + parts[1] + "&y=" + parts[2]).then(function (response) {
+            return response.json();
+        }).then(function (tile) {
+            if (number !== generation) return;
+            pending.delete(key);
+            if (tile.error) { console.log("Couldn't load map tile " + key + ": " + tile.error); return; }
+            tiles.set(key, tile.clusters.map(function (cluster) { cluster.type = "cluster"; return cluster; }).concat(tile.points));
+            while (tiles.size > cacheSize) tiles.delete(tiles.keys().next().value);
+            if (parts[0] == Math.round(map.getZoom())) show();
+        }).catch(function (error) {
+            if (number === generation) pending.delete(key);
+            console.log("Couldn't load map tile " + key + ": " + error);
+        });
+    }
+    function load() { //asks for the tiles in view that aren't kept or on their way already
+        visibleTiles().forEach(function (tile) {
+            var key = tile.slice(0, 3).join("/");
+            if (!tiles.has(key) && !pending.has(key)) fetchTile(key);
+        });
+        show();
+    }
+    window.basecampRefresh = function () {
+        generation++;
+        tiles.clear();
+        pending.clear();
+        load();
+    };
+    map.on("moveend", load);
+    load();
+
+    var tooltip = L.tooltip({direction: "top", offset: [0, -6]});
+    map.on("mousemove", function (event) {
+        var item = layer.itemAt(event.containerPoint);
+        map.getContainer().style.cursor = item ? "pointer" : "";
+        if (!item) { map.closeTooltip(tooltip); return; }
+        tooltip.setLatLng([item.lat, item.lon]).setContent(render(item));
+        if (!map.hasLayer(tooltip)) map.openTooltip(tooltip);
+    });
+    map.on("click", function (event) {
+        var item = layer.itemAt(event.containerPoint);
+        if (!item) return;
+        if (item.type === "cluster") {
+            map.setView([item.lat, item.lon], Math.min(map.getZoom() + 2, map.getMaxZoom()));
+        } else {
+            L.popup().setLatLng([item.lat, item.lon]).setContent("<b>" + escapeHtml(item.name) + "</b>").openOn(map);
+        }
+    });
+})();
+"""
+
+def map_html(): #the whole map page
+    import folium
+    from branca.element import MacroElement, Template
+    main_map = folium.Map(**MAP_SETTINGS)
+
+    #the page only has the settings and templates, the points are asked for and drawn in the browser.
+    #as a child of the map its script goes after the map's own L.map(...), so the map exists when it runs
+    layer = MacroElement()
+    layer._name = "PointLayer"
+    layer._template = Template("{% macro script(this, kwargs) %}"
+                               "{{ this.code.replace('__MAP__', this._parent.get_name()) }}"
+                               "{% endmacro %}")
+    layer.code = (MAP_SCRIPT.replace('__STYLES__', script_json(MAP_STYLES))
+                  .replace('__TEMPLATES__', script_json(TOOLTIP_TEMPLATES))
+                  .replace('__URL__', script_json(TILES_URL))
+                  .replace('__CACHE__', script_json(TILE_CACHE)))
+    main_map.add_child(layer)
+    return main_map.get_root().render()
+
+MAP_STEPS = ("Checking the map", "Loading the map library", "Drawing the map", "Saving the map")
+
+def make_main_map(force=False, progress=None):
+    """
+    Makes main_map.html next to the app so the local server can send it, unless the one already there is current.
+    Returns True if the map was rebuilt, False if the existing one was kept.
+    progress is called with (step, len(MAP_STEPS), message) before each step. An exception raised in it stops
+    the build there and is passed on; the file is only written in the last step (see replace_file), so nothing
+    is left half done.
+    """
+    def step(number):
+        if progress is not None:
+            progress(number, len(MAP_STEPS), MAP_STEPS[number])
+
+    step(0)
+    stamp = map_stamp()
+    if not force and map_is_current(stamp):
+        logger.info("Main map is up to date, reusing it.")
+        return False
+
+    step(1)
+    import folium #only loaded when a map is made, it's slow to import
+
+    step(2)
+    html = map_html()
+
+    step(3)
+    try:
+        replace_file(map_path, html)
+    except OSError as e:
+        raise FileError(f"{e}") from e
+    save_map_meta(stamp)
+    logger.info("Main map created.")
+    return True
@@ -0,0 +1,246 @@
+import logging
+from datetime import datetime
+from .errors import InvalidInputError
+
+logger = logging.getLogger(__name__)
+
+type_map= {
+    'campsite': {
+        'fieldnames':['name','state','rating','description','url', 'longitude', 'latitude'],
+        'numeric_fields':['rating'],
+        'format':"Name: {name}\nState: {state}\nRating: {rating}\nDescription: {description}\nURL: {url}\n"
+    },
+    'mountain': {
+        'fieldnames':['name','state','rating','elevation','ascension','time','description','date','url', 'longitude', 'latitude'],
+        'numeric_fields':['rating','elevation','ascension'],
+        'format':"Name: {name}\nState: {state}\nRating: {rating}\nElevation: {elevation}\nTotal Feet Ascended: {ascension}\nTime to Complete: {time}\nDescription: {description}\nDate Completed: {date}\nURL: {url}\n"
+    }
+}
+
+def campsite_format(name, state, rating, description, url, longitude, latitude):
+    formatted_output = (
+        f"Name: {name}\nState: {state}\nRating: {rating}\nDescription: {description}\nURL: {url}\nCoordinates: {latitude},{longitude}\n"
+    )
+    return formatted_output
+
+def mountain_format(name, state, rating, elevation, ascension, time_completed, description, date, url, longitude, latitude):
+    formatted_output = (
+        f"Name: {name}\nState: {state}\nRating: {rating}\nElevation: {elevation}\nTotal Feet Ascended: {ascension}\nTime to complete: {time_completed}\nDescription: {description}\nDate Completed: {date}\nURL: {url}\nCoordinates: {latitude},{longitude}\n"
+    )
+    return formatted_output
+
+
+columns = {
+    'campsite': ['id', 'name', 'state', 'rating', 'description', 'url', 'longitude', 'latitude'],
+    'mountain': ['id', 'name', 'state', 'rating', 'elevation', 'ascension', 'time_completed', 'description', 'date', 'url', 'longitude', 'latitude']
+}
+
+
+#=== Records ===
+"""
+Rows come back as Campsite/Mountain records instead of tuples (use row_factory=records[type] on a cursor).
+They use __slots__, so each one is about the size of the tuple it replaces, and the long display text
+is only built when display_text() is called, which the app does when a table cell is painted.
+"""
+class Campsite:
+    __slots__ = ('id', 'name', 'state', 'rating', 'description', 'url', 'longitude', 'latitude')
+    type = 'campsite'
+
+    def __init__(self, id, name, state, rating, description, url, longitude, latitude):
+        self.id = id
+        self.name = name
+        self.state = state
+        self.rating = rating
+        self.description = description
+        self.url = url
+        self.longitude = longitude
+        self.latitude = latitude
+
+    @classmethod
+    def from_row(cls, cursor, row): #sqlite3 row_factory
+        return cls(*row)
+
+    def display_text(self):
+        return campsite_format(self.name, self.state, self.rating, self.description, self.url, self.longitude, self.latitude)
+
+    def __repr__(self):
+        return f"Campsite(id={self.id}, name={self.name!r})"
+
+class Mountain:
+    __slots__ = ('id', 'name', 'state', 'rating', 'elevation', 'ascension', 'time_completed', 'description', 'date', 'url', 'longitude', 'latitude')
+    type = 'mountain'
+
+    def __init__(self, id, name, state, rating, elevation, ascension, time_completed, description, date, url, longitude, latitude):
+        self.id = id
+        self.name = name
+        self.state = state
+        self.rating = rating
+        self.elevation = elevation
+        self.ascension = ascension
+        self.time_completed = time_completed
+        self.description = description
+        self.date = date
+        self.url = url
+        self.longitude = longitude
+        self.latitude = latitude
+
+    @classmethod
+    def from_row(cls, cursor, row): #sqlite3 row_factory
+        return cls(*row)
+
+    def display_text(self):
+        return mountain_format(self.name, self.state, self.rating, self.elevation, self.ascension, self.time_completed,
+                               self.description, self.date, self.url, self.longitude, self.latitude)
+
+    def __repr__(self):
+        return f"Mountain(id={self.id}, name={self.name!r})"
+
+records = {'campsite': Campsite.from_row, 'mountain': Mountain.from_row}
+
+
+US_States = {
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky",
+    "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
+    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey", "New Mexico",
+    "New York", "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania",
+    "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont",
+    "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming"
+}
+
+def validate_type(type): #utility function for validating types
+    if type not in type_map:
+        raise InvalidInputError(f"Invalid type: {type}.")
+
+#info = ['name, state, rating, description, URL, longitude, latitude']
+#info_m = ['name, state, rating, elevation, ascension, time, description, date, URL, longitude, latitude']
+
+def validate_item(type, info): #checks and converts item info, raises InvalidInputError with the problem if something is wrong
+    name = info[0].strip()
+    if not name: #makes sure that the name isn't left blank
+        raise InvalidInputError(f"{type.title()} name cannot be empty.")
+
+    state = info[1].strip().title()
+    if not (state in US_States): #checks if the state matches the set
+        raise InvalidInputError("State cannot be empty.")
+
+    rating = info[2]
+    try: #making sure correct values are implemented
+        rating = float(rating)
+        if not (1 <= rating <= 5):
+            raise ValueError
+    except ValueError:
+        raise InvalidInputError("Enter a value from 1 to 5.")
+
+    if type == 'mountain':
+        elevation = info[3]
+        try:
+            elevation = float(elevation)
+            if elevation < 0:
+                raise ValueError
+        except ValueError:
+            raise InvalidInputError("Elevation must be a number.")
+
+        ascension = info[4]
+        try:
+            ascension = float(ascension)
+            if not ascension >= 0:
+                raise ValueError
+        except ValueError:
+            raise InvalidInputError("Ascension must be a number.")
+
+        time = info[5].strip()
+        try:
+            hours, minutes = map(int, time.split(':')) #parsing the data of date
+            if not (0 <= hours < 24 and 0 <= minutes <= 59): #checking hours and minutes individually
+                raise ValueError
+        except ValueError:
+            raise InvalidInputError("Please enter a valid time.")
+
+    if type == 'campsite':
+        description = info[3].strip()
+    else:
+        description = info[6].strip()
+    if not description: #checks if description exists
+        raise InvalidInputError("Description cannot be empty.")
+
+    if type == 'mountain':
+        date = info[7].strip()
+        try:
+            date = datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            raise InvalidInputError("Please enter a valid date.")
+
+    if type == 'campsite':
+        url = info[4].strip()
+    else:
+        url = info[8].strip()
+    if not url or not url.startswith(('https://', 'http://')):#checks if url starts with valid address
+        raise InvalidInputError("URL must begin with 'https://' or 'http://'.")
+
+    if type == 'campsite':
+        longitude = info[5].strip()
+    else:
+        longitude = info[9].strip()
+    try:
+        longitude = float(longitude)
+    except ValueError:
+        raise InvalidInputError("Longitude must be a number.")
+
+    if type == 'campsite':
+        latitude = info[6].strip()
+    else:
+        latitude = info[10].strip()
+    try:
+        latitude = float(latitude)
+    except ValueError:
+        raise InvalidInputError("Latitude must be a number.")
+
+    if type == 'mountain':
+        # makes date and time into formatted string
+        time_completed = f"{hours:02}:{minutes:02}"
+        date = date.strftime('%Y-%m-%d')
+        return name, state, rating, elevation, ascension, time_completed, description, date, url, longitude, latitude
+
+    return name, state, rating, description, url, longitude, latitude
+
+
+def validate_value(type, column, new_value): #checks a new value for one column, returns the real column name and the converted value
+    if column not in type_map[type]['fieldnames']:
+        raise InvalidInputError("Invalid attribute to replace by.")
+
+    if column == "time":
+        column = "time_completed"
+
+    new_value = new_value.strip() #gets input for new value
+
+    if not new_value: #checks for empty new_value
+        raise InvalidInputError("New value cannot be empty.")
+
+    if column == "state" and new_value not in US_States: #checks if state is valid
+        raise InvalidInputError("Enter a valid US state.")
+
+    if column in ["ascension", "elevation", "rating", "longitude", "latitude"]: #checks if all number columns are numbers.
+        try:
+            new_value = float(new_value)
+        except ValueError:
+            raise InvalidInputError(f"{column.title()} must be a number.")
+
+    if column == "url" and not new_value.startswith(("https://", "http://")):
+        raise InvalidInputError("URL must begin with 'https://' or 'http://'.")
+
+    if column == "time_completed":
+        try:
+            hours, minutes = map(int, new_value.split(':'))  # parsing the data of date
+            if not (0 <= hours < 24 and 0 <= minutes <= 59):  # checking hours and minutes individually
+                raise ValueError
+        except ValueError:
+            raise InvalidInputError("Please enter a valid time. Time must be in __:__ format.")
+
+    if column == "date":
+        try:
+            datetime.strptime(new_value, '%Y-%m-%d') #checks if new_value is in the right format
+        except ValueError:
+            raise InvalidInputError("Please enter a valid date. Date must be in YYYY-MM-DD format.")
+
+    return column, new_value
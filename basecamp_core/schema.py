@@ -0,0 +1,580 @@
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+#one index per column the display pages can filter/sort by. name and state inherit NOCASE from the table
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_campsite_name ON campsite(name)",
+    "CREATE INDEX IF NOT EXISTS idx_campsite_state ON campsite(state)",
+    "CREATE INDEX IF NOT EXISTS idx_campsite_rating ON campsite(rating)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_name ON mountain(name)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_state ON mountain(state)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_rating ON mountain(rating)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_elevation ON mountain(elevation)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_ascension ON mountain(ascension)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_time ON mountain(time_completed)",
+    "CREATE INDEX IF NOT EXISTS idx_mountain_date ON mountain(date)",
+]
+
+#=== Full Text Search ===
+"""
+Each table has an FTS5 index over its name, state and description. They are "external content" tables,
+meaning they only store the index and read the text from campsite/mountain, so the data isn't stored twice.
+Triggers keep the index in sync with every insert, delete and update.
+"""
+SEARCH_COLUMNS = ['name', 'state', 'description']
+search_available = True #turned off if this sqlite was built without FTS5
+
+def create_search_tables(c): #creates the FTS5 tables and their triggers
+    global search_available
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_columns = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_columns = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+
+    for type in ('campsite', 'mountain'):
+        fts = f"{type}_fts"
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+        try:
+            c.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    {columns}, content='{type}', content_rowid='id', tokenize='porter unicode61', prefix='2 3'
+                    )
+                """)
+        except sqlite3.OperationalError as e: #"no such module: fts5"
+            search_available = False
+            logger.warning(f"Full text search unavailable, falling back to name search: {e}")
+            return
+
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {type} BEGIN
+                INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_columns});
+            END
+            """)
+        #a row the backfill hasn't indexed yet is left to it, a 'delete' of text that was never indexed breaks the index
+        waiting = backfill_pending(fts, 'old')
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {type} WHEN NOT {waiting} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {columns} ON {type} WHEN NOT {waiting} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_columns});
+            END
+            """)
+
+        if not exists: #the rows that were there before the search table are indexed in batches afterwards
+            schedule_backfill(c, fts, type)
+
+def backfill_search_tables(conn, progress=None): #indexes rows that predate the FTS5 tables
+    columns = ', '.join(SEARCH_COLUMNS)
+    for type in ('campsite', 'mountain'):
+        fts = f"{type}_fts"
+        run_backfill(conn, fts, f"""
+            INSERT INTO {fts}(rowid, {columns}) SELECT id, {columns} FROM {type} WHERE id > ? AND id <= ?
+            """, progress)
+
+#=== Spatial Index ===
+"""
+Each table has an R*Tree index on its coordinates so location queries only look at nearby rows.
+Every item is a point, so its box is just its longitude and latitude on both sides.
+Triggers keep the index in sync, rows without coordinates are left out of it.
+"""
+def create_spatial_tables(c): #creates the R*Tree tables and their triggers
+    for type in ('campsite', 'mountain'):
+        rtree = f"{type}_rtree"
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE name=?", (rtree,)).fetchone()
+        c.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {rtree} USING rtree(id, min_lon, max_lon, min_lat, max_lat)")
+
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {rtree}_insert AFTER INSERT ON {type}
+            WHEN new.longitude IS NOT NULL AND new.latitude IS NOT NULL BEGIN
+                INSERT INTO {rtree} VALUES (new.id, new.longitude, new.longitude, new.latitude, new.latitude);
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {rtree}_delete AFTER DELETE ON {type} BEGIN
+                DELETE FROM {rtree} WHERE id = old.id;
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {rtree}_update AFTER UPDATE OF longitude, latitude ON {type} BEGIN
+                DELETE FROM {rtree} WHERE id = old.id;
+                INSERT INTO {rtree} SELECT new.id, new.longitude, new.longitude, new.latitude, new.latitude
+                    WHERE new.longitude IS NOT NULL AND new.latitude IS NOT NULL;
+            END
+            """)
+
+        if not exists: #the rows that were there before the spatial table are indexed in batches afterwards
+            schedule_backfill(c, rtree, type)
+
+def backfill_spatial_tables(conn, progress=None): #indexes rows that predate the R*Tree tables
+    for type in ('campsite', 'mountain'):
+        rtree = f"{type}_rtree"
+        #OR REPLACE in case the update trigger already added a row while the backfill was paused
+        run_backfill(conn, rtree, f"""
+            INSERT OR REPLACE INTO {rtree} SELECT id, longitude, longitude, latitude, latitude FROM {type}
+            WHERE id > ? AND id <= ? AND longitude IS NOT NULL AND latitude IS NOT NULL
+            """, progress)
+
+#=== Change Counter ===
+"""
+A single number that goes up on every insert, update or delete of a campsite or mountain, kept by triggers,
+and on every backfill batch.
+Anything cached from the database can store the counter it was made at and knows it's stale once it moves.
+It works across threads and connections, and it's saved in the file so it carries over between sessions.
+"""
+def create_change_counter(c):
+    c.execute("CREATE TABLE IF NOT EXISTS db_changes (id INTEGER PRIMARY KEY CHECK (id = 1), counter INTEGER NOT NULL)")
+    c.execute("INSERT OR IGNORE INTO db_changes VALUES (1, 0)")
+    for type in ('campsite', 'mountain'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {type}_changes_{event.lower()} AFTER {event} ON {type} BEGIN
+                    UPDATE db_changes SET counter = counter + 1 WHERE id = 1;
+                END
+                """)
+
+#=== Summary Tables ===
+"""
+The statistics pages read from two small tables instead of counting and averaging the whole table each time.
+stats_totals holds the row count and the elevation/ascension sums of each type, stats_by_state the count per state.
+Triggers update them on every insert, delete and update, so they are always current.
+"""
+def create_summary_tables(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='stats_totals'").fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS stats_totals (
+                type TEXT PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                elevation_sum REAL NOT NULL DEFAULT 0,
+                ascension_sum REAL NOT NULL DEFAULT 0
+                )
+            """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS stats_by_state (
+                type TEXT NOT NULL,
+                state TEXT NOT NULL COLLATE NOCASE,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (type, state)
+                )
+            """)
+
+    for type in ('campsite', 'mountain'):
+        #campsites don't have elevation or ascension, so they add 0
+        elevation, ascension = ('elevation', 'ascension') if type == 'mountain' else ('0', '0')
+        new_elevation, new_ascension = (f"new.{elevation}", f"new.{ascension}") if type == 'mountain' else ('0', '0')
+        old_elevation, old_ascension = (f"old.{elevation}", f"old.{ascension}") if type == 'mountain' else ('0', '0')
+        add_state = f"""INSERT INTO stats_by_state VALUES ('{type}', new.state, 1)
+                        ON CONFLICT (type, state) DO UPDATE SET count = count + 1;"""
+        remove_state = f"""UPDATE stats_by_state SET count = count - 1 WHERE type = '{type}' AND state = old.state;
+                           DELETE FROM stats_by_state WHERE type = '{type}' AND state = old.state AND count <= 0;"""
+
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_stats_insert AFTER INSERT ON {type} BEGIN
+                UPDATE stats_totals SET total = total + 1, elevation_sum = elevation_sum + {new_elevation},
+                    ascension_sum = ascension_sum + {new_ascension} WHERE type = '{type}';
+                {add_state}
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_stats_delete AFTER DELETE ON {type} BEGIN
+                UPDATE stats_totals SET total = total - 1, elevation_sum = elevation_sum - {old_elevation},
+                    ascension_sum = ascension_sum - {old_ascension} WHERE type = '{type}';
+                {remove_state}
+            END
+            """)
+        update_columns = 'state, elevation, ascension' if type == 'mountain' else 'state'
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_stats_update AFTER UPDATE OF {update_columns} ON {type} BEGIN
+                UPDATE stats_totals SET elevation_sum = elevation_sum - {old_elevation} + {new_elevation},
+                    ascension_sum = ascension_sum - {old_ascension} + {new_ascension} WHERE type = '{type}';
+                {remove_state}
+                {add_state}
+            END
+            """)
+
+    if not exists: #fills them in from the rows that were there before
+        rebuild_summary_tables(c)
+
+def rebuild_summary_tables(c): #recalculates the summary tables from scratch
+    c.execute("DELETE FROM stats_totals")
+    c.execute("DELETE FROM stats_by_state")
+    c.execute("INSERT INTO stats_totals SELECT 'campsite', COUNT(*), 0, 0 FROM campsite")
+    c.execute("INSERT INTO stats_totals SELECT 'mountain', COUNT(*), TOTAL(elevation), TOTAL(ascension) FROM mountain")
+    for type in ('campsite', 'mountain'):
+        c.execute(f"INSERT INTO stats_by_state SELECT '{type}', state, COUNT(*) FROM {type} GROUP BY state")
+    logger.info("Statistics summary tables rebuilt.")
+
+#=== Value Counts ===
+"""
+stats_values counts how many rows have each value of the fields the distribution statistics use, per state.
+Medians, percentiles and histograms are worked out from these (value, count) rows instead of reading every
+row of the table, which keeps them well under a second with a million mountains.
+Elevation and ascension are counted in steps of 10 ft and time_completed in minutes, so results for them
+are within 10 ft / 1 minute of the exact ones. Triggers keep the counts current. The rows that were there
+before the table are counted in batches afterwards, and until a row has been counted its triggers skip it.
+"""
+VALUE_FIELDS = { #field -> SQL for the value counted, {row} is new/old in the triggers or the table name
+    'campsite': {
+        'rating': "{row}.rating"
+    },
+    'mountain': {
+        'rating': "{row}.rating",
+        'elevation': "ROUND({row}.elevation / 10.0) * 10",
+        'ascension': "ROUND({row}.ascension / 10.0) * 10",
+        'time_completed': "CAST(substr({row}.time_completed, 1, 2) AS INTEGER) * 60 + CAST(substr({row}.time_completed, 4, 2) AS INTEGER)"
+    }
+}
+
+def create_value_tables(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='stats_values'").fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS stats_values (
+                type TEXT NOT NULL,
+                field TEXT NOT NULL,
+                state TEXT NOT NULL COLLATE NOCASE,
+                value REAL NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (type, field, state, value)
+                ) WITHOUT ROWID
+            """)
+
+    for type, fields in VALUE_FIELDS.items():
+        waiting = backfill_pending(f"{type}_values", 'old') #a row the backfill hasn't counted yet has nothing to take back
+        add_values = ''
+        remove_values = ''
+        for field, value in fields.items():
+            new_value, old_value = value.format(row='new'), value.format(row='old')
+            add_values += f"""INSERT INTO stats_values VALUES ('{type}', '{field}', new.state, {new_value}, 1)
+                              ON CONFLICT (type, field, state, value) DO UPDATE SET count = count + 1;"""
+            match = f"type = '{type}' AND field = '{field}' AND state = old.state AND value = {old_value}"
+            remove_values += f"""UPDATE stats_values SET count = count - 1 WHERE {match};
+                                 DELETE FROM stats_values WHERE {match} AND count <= 0;"""
+
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_values_insert AFTER INSERT ON {type} BEGIN
+                {add_values}
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_values_delete AFTER DELETE ON {type} WHEN NOT {waiting} BEGIN
+                {remove_values}
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_values_update AFTER UPDATE OF state, {', '.join(fields)} ON {type} WHEN NOT {waiting} BEGIN
+                {remove_values}
+                {add_values}
+            END
+            """)
+
+        if not exists: #the rows that were there before are counted in batches afterwards
+            schedule_backfill(c, f"{type}_values", type)
+
+def backfill_value_tables(conn, progress=None): #counts the rows that predate stats_values
+    for type, fields in VALUE_FIELDS.items():
+        counts = " UNION ALL ".join(f"SELECT '{type}', '{field}', state, {value.format(row='batch')}, COUNT(*) FROM batch GROUP BY 3, 4"
+                                    for field, value in fields.items())
+        run_backfill(conn, f"{type}_values", f"""
+            WITH batch AS (SELECT * FROM {type} WHERE id > ? AND id <= ?)
+            INSERT INTO stats_values SELECT * FROM ({counts}) WHERE true
+            ON CONFLICT (type, field, state, value) DO UPDATE SET count = count + excluded.count
+            """, progress)
+
+#=== Climb Rollups ===
+"""
+climb_rollups keeps running totals of the mountains climbed in each week, month and year (by date):
+how many climbs, their ascension, elevation and time in minutes. Triggers add a mountain to its three
+periods when it's inserted and take it back out when it's deleted or its date/numbers are edited,
+so the history never has to be recomputed. start is the first day of the period, weeks start on Monday.
+Mountains that were there before the table are added in batches afterwards, like the value counts.
+"""
+ROLLUP_PERIODS = { #period -> SQL for the first day of the period a date is in
+    'week': "date({date}, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m-01', {date})",
+    'year': "strftime('%Y-01-01', {date})"
+}
+ROLLUP_MINUTES = "(CAST(substr({row}.time_completed, 1, 2) AS INTEGER) * 60 + CAST(substr({row}.time_completed, 4, 2) AS INTEGER))"
+
+def create_rollup_tables(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='climb_rollups'").fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS climb_rollups (
+                period TEXT NOT NULL,
+                start TEXT NOT NULL,
+                climbs INTEGER NOT NULL,
+                ascension REAL NOT NULL,
+                elevation REAL NOT NULL,
+                minutes INTEGER NOT NULL,
+                PRIMARY KEY (period, start)
+                ) WITHOUT ROWID
+            """)
+
+    add_climb = ''
+    remove_climb = ''
+    for period, start in ROLLUP_PERIODS.items():
+        new_start, old_start = start.format(date='new.date'), start.format(date='old.date')
+        #a date sqlite can't read has no period, so it's left out of the rollups
+        add_climb += f"""INSERT INTO climb_rollups
+                         SELECT '{period}', {new_start}, 1, new.ascension, new.elevation, {ROLLUP_MINUTES.format(row='new')}
+                         WHERE {new_start} IS NOT NULL
+                         ON CONFLICT (period, start) DO UPDATE SET climbs = climbs + 1, ascension = ascension + excluded.ascension,
+                         elevation = elevation + excluded.elevation, minutes = minutes + excluded.minutes;"""
+        match = f"period = '{period}' AND start = {old_start}"
+        remove_climb += f"""UPDATE climb_rollups SET climbs = climbs - 1, ascension = ascension - old.ascension,
+                            elevation = elevation - old.elevation, minutes = minutes - {ROLLUP_MINUTES.format(row='old')} WHERE {match};
+                            DELETE FROM climb_rollups WHERE {match} AND climbs <= 0;"""
+
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mountain_rollups_insert AFTER INSERT ON mountain BEGIN
+            {add_climb}
+        END
+        """)
+    waiting = backfill_pending('mountain_rollups', 'old') #not added by the backfill yet, so there's nothing to take back
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mountain_rollups_delete AFTER DELETE ON mountain WHEN NOT {waiting} BEGIN
+            {remove_climb}
+        END
+        """)
+    c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS mountain_rollups_update AFTER UPDATE OF date, ascension, elevation, time_completed ON mountain
+        WHEN NOT {waiting} BEGIN
+            {remove_climb}
+            {add_climb}
+        END
+        """)
+
+    if not exists:
+        schedule_backfill(c, 'mountain_rollups', 'mountain')
+
+def backfill_rollup_tables(conn, progress=None): #adds the mountains that predate climb_rollups
+    totals = " UNION ALL ".join(f"""SELECT '{period}', {start.format(date='date')} AS start, COUNT(*), SUM(ascension), SUM(elevation),
+                                    SUM({ROLLUP_MINUTES.format(row='batch')}) FROM batch WHERE start IS NOT NULL GROUP BY start"""
+                                for period, start in ROLLUP_PERIODS.items())
+    run_backfill(conn, 'mountain_rollups', f"""
+        WITH batch AS (SELECT * FROM mountain WHERE id > ? AND id <= ?)
+        INSERT INTO climb_rollups SELECT * FROM ({totals}) WHERE true
+        ON CONFLICT (period, start) DO UPDATE SET climbs = climbs + excluded.climbs, ascension = ascension + excluded.ascension,
+        elevation = elevation + excluded.elevation, minutes = minutes + excluded.minutes
+        """, progress)
+
+#=== Map Clusters ===
+"""
+map_clusters holds the map's point clusters for every zoom level (see clusters.py), map_changes is the list
+of coordinates added (+1) and removed (-1) since they were last brought up to date. The triggers only log the
+change, working out which clusters it lands in needs the map projection, which is done in Python.
+When the tables are new every existing point is logged as added by a batched backfill, so the updates after
+it build the clusters. Until a point has been logged its triggers skip it.
+"""
+def create_cluster_tables(c):
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name='map_clusters'").fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS map_clusters (
+                zoom INTEGER NOT NULL,
+                cx INTEGER NOT NULL,
+                cy INTEGER NOT NULL,
+                campsites INTEGER NOT NULL,
+                mountains INTEGER NOT NULL,
+                sum_x REAL NOT NULL,
+                sum_y REAL NOT NULL,
+                PRIMARY KEY (zoom, cx, cy)
+                ) WITHOUT ROWID
+            """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS map_changes (
+                seq INTEGER PRIMARY KEY,
+                type TEXT NOT NULL,
+                longitude REAL NOT NULL,
+                latitude REAL NOT NULL,
+                change INTEGER NOT NULL
+                )
+            """)
+
+    for type in ('campsite', 'mountain'):
+        waiting = backfill_pending(f"{type}_clusters", 'old') #not logged as added yet, so its removal isn't logged either
+        add_point = f"""INSERT INTO map_changes (type, longitude, latitude, change)
+                        SELECT '{type}', new.longitude, new.latitude, 1 WHERE new.longitude IS NOT NULL AND new.latitude IS NOT NULL;"""
+        remove_point = f"""INSERT INTO map_changes (type, longitude, latitude, change)
+                           SELECT '{type}', old.longitude, old.latitude, -1 WHERE old.longitude IS NOT NULL AND old.latitude IS NOT NULL;"""
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_clusters_insert AFTER INSERT ON {type} BEGIN
+                {add_point}
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_clusters_delete AFTER DELETE ON {type} WHEN NOT {waiting} BEGIN
+                {remove_point}
+            END
+            """)
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {type}_clusters_update AFTER UPDATE OF longitude, latitude ON {type} WHEN NOT {waiting} BEGIN
+                {remove_point}
+                {add_point}
+            END
+            """)
+
+        if not exists:
+            schedule_backfill(c, f"{type}_clusters", type)
+
+def backfill_cluster_tables(conn, progress=None): #logs the points that predate the cluster tables as added
+    for type in ('campsite', 'mountain'):
+        run_backfill(conn, f"{type}_clusters", f"""
+            INSERT INTO map_changes (type, longitude, latitude, change) SELECT '{type}', longitude, latitude, 1 FROM {type}
+            WHERE id > ? AND id <= ? AND longitude IS NOT NULL AND latitude IS NOT NULL
+            """, progress)
+
+#=== Schema Migrations ===
+"""
+The schema is versioned with PRAGMA user_version, every migration below moves it up by one.
+When the first connection is opened the ones newer than the file are applied in order, each in its own
+transaction together with the version bump, so a failed migration leaves the file at the last good version
+and is retried next time.
+Filling a new index from existing rows is done afterwards in batches of MIGRATION_BATCH_SIZE ids, one
+transaction each, so a large database stays usable in between (the connection manager runs them on a thread
+of their own, queries use the partly filled tables until they're done). Their progress is saved in
+migration_progress, so an interrupted backfill continues where it stopped. Files made before versioning start at 0, which is
+fine since every migration checks what's already there.
+To change the schema, add a migration to the end of the list, never edit one that has shipped.
+"""
+MIGRATION_BATCH_SIZE = 20000
+
+@contextmanager
+def transaction(conn): #explicit transaction, sqlite3 only opens one on its own for INSERT/UPDATE/DELETE and not DDL
+    conn.execute("BEGIN IMMEDIATE")
+    c = conn.cursor()
+    try:
+        yield c
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+    finally:
+        c.close()
+
+def create_tables(c): #campsite and mountain, adding the coordinate columns to files made before they existed
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS campsite (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL COLLATE NOCASE,
+                state TEXT NOT NULL COLLATE NOCASE,
+                rating REAL NOT NULL CHECK (rating BETWEEN 0 AND 5),
+                description TEXT,
+                url TEXT,
+                longitude REAL,
+                latitude REAL
+                )
+            """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS mountain (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL COLLATE NOCASE,
+                state TEXT NOT NULL COLLATE NOCASE,
+                rating REAL NOT NULL CHECK (rating BETWEEN 0 AND 5),
+                elevation REAL NOT NULL CHECK (elevation >= 0),
+                ascension REAL NOT NULL CHECK (ascension >= 0),
+                time_completed TEXT NOT NULL CHECK (time_completed LIKE '__:__'),
+                description TEXT,
+                date TEXT NOT NULL CHECK (date LIKE '____-__-__'),
+                url TEXT,
+                longitude REAL,
+                latitude REAL
+                )
+            """)
+    for type in ('campsite', 'mountain'):
+        existing = {row[1] for row in c.execute(f"PRAGMA table_info({type})")}
+        for column in ('longitude', 'latitude'):
+            if column not in existing:
+                c.execute(f"ALTER TABLE {type} ADD COLUMN {column} REAL")
+
+def create_indexes(c):
+    for statement in INDEXES:
+        c.execute(statement)
+
+def schedule_backfill(c, task, type): #records that the rows of type up to now still have to go into a new index
+    #rows added later are covered by the index's own triggers
+    c.execute(f"INSERT OR REPLACE INTO migration_progress SELECT ?, 0, MAX(id) FROM {type} HAVING MAX(id) IS NOT NULL", (task,))
+
+def backfill_pending(task, row): #SQL that's true while row (new/old) is still waiting for the backfill of task
+    return f"EXISTS (SELECT 1 FROM migration_progress WHERE task = '{task}' AND {row}.id > last_id AND {row}.id <= stop_id)"
+
+def run_backfill(conn, task, statement, progress=None): #runs statement over id ranges (bound to its two ?), one transaction each
+    while True:
+        with transaction(conn) as c:
+            #read again inside every batch's transaction, since another connection (the app and a script
+            #at the same time) can be running the same backfill, and each batch must only be applied once
+            row = c.execute("SELECT last_id, stop_id FROM migration_progress WHERE task = ?", (task,)).fetchone()
+            if row is None: #nothing scheduled, or another connection finished it
+                return
+            last_id, stop_id = row
+            if last_id >= stop_id:
+                c.execute("DELETE FROM migration_progress WHERE task = ?", (task,))
+                break
+            end = min(last_id + MIGRATION_BATCH_SIZE, stop_id)
+            c.execute(statement, (last_id, end))
+            c.execute("UPDATE migration_progress SET last_id = ? WHERE task = ?", (end, task))
+            #queries run while the backfill does, so each batch changes their results like a write would
+            c.execute("UPDATE db_changes SET counter = counter + 1 WHERE id = 1")
+        report_progress(progress, task, end, stop_id)
+    logger.info(f"Backfill of {task} done.")
+
+def report_progress(progress, task, done, total): #calls progress(task, done, total) if given, logs otherwise
+    if progress is not None:
+        progress(task, done, total)
+    else:
+        logger.info(f"{task}: {done}/{total} ids")
+
+#(version, description, schema step run in the migration's transaction, batched backfill run after it or None)
+MIGRATIONS = [
+    (1, "campsite and mountain tables", create_tables, None),
+    (2, "search and sort indexes", create_indexes, None),
+    (3, "full text search tables", create_search_tables, backfill_search_tables),
+    (4, "spatial index tables", create_spatial_tables, backfill_spatial_tables),
+    (5, "change counter", create_change_counter, None),
+    (6, "statistics summary tables", create_summary_tables, None),
+    (7, "value counts for distribution statistics", create_value_tables, backfill_value_tables),
+    (8, "weekly, monthly and yearly climb rollups", create_rollup_tables, backfill_rollup_tables),
+    (9, "map clusters", create_cluster_tables, backfill_cluster_tables),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def update_schema(conn): #applies the schema steps newer than the file, the backfills they schedule are left to run_backfills
+    global search_available
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS migration_progress (
+                task TEXT PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                stop_id INTEGER NOT NULL
+                )
+            """)
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        logger.warning(f"Database schema version {version} is newer than this app ({SCHEMA_VERSION}).")
+
+    for number, description, schema_step, backfill_step in MIGRATIONS:
+        if number <= version:
+            continue
+        logger.info(f"Applying migration {number}: {description}.")
+        with transaction(conn) as c:
+            schema_step(c)
+            #backfills are resumable on their own, so the version only has to wait for the schema step
+            c.execute(f"PRAGMA user_version = {number}")
+        version = number
+
+    search_available = conn.execute("SELECT 1 FROM sqlite_master WHERE name='campsite_fts'").fetchone() is not None
+
+def run_backfills(conn, progress=None): #runs every backfill still pending, including ones left unfinished by an earlier run
+    for number, description, schema_step, backfill_step in MIGRATIONS:
+        if backfill_step is not None:
+            backfill_step(conn, progress)
+
+def migrate(conn, progress=None): #brings the database up to SCHEMA_VERSION, progress(task, done, total) is called during backfills
+    update_schema(conn)
+    run_backfills(conn, progress)
@@ -0,0 +1,51 @@
+import re
+import logging
+from . import schema
+from .connection import db
+from .errors import InvalidInputError, database_errors
+from .records import records, validate_type
+from .cache import cached_query
+from .items import item_search
+
+logger = logging.getLogger(__name__)
+
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0) #bm25 weight of each of schema.SEARCH_COLUMNS, a match in the name counts the most
+STOP_WORDS = {'a', 'an', 'and', 'at', 'by', 'for', 'in', 'near', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'with'}
+
+def search_query(text): #turns what the user typed into an FTS5 query
+    """
+    Every word is quoted (so characters like - or " can't break the query syntax) and made a prefix,
+    so "katah" finds "Katahdin". Words are OR'd together and bm25 ranks rows matching more of them first,
+    so "that lake campsite in Maine" still finds "Lake Site" in Maine. Filler words are dropped.
+    """
+    words = re.findall(r'\w+', text.lower())
+    kept = [word for word in words if word not in STOP_WORDS] or words #keeps them if that's all there is
+    return ' OR '.join(f'"{word}"*' for word in kept)
+
+@cached_query
+def full_text_search(text, type, limit=50): #ranked search over name, state and description
+    validate_type(type)
+
+    text = text.strip()
+    if not text:
+        raise InvalidInputError("Search cannot be empty.")
+
+    db.connection() #makes sure the migrations have run, they find out if FTS5 is there
+    if not schema.search_available:
+        return item_search(text, type)
+
+    query = search_query(text)
+    if not query:
+        return []
+
+    weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+    with database_errors(), db.cursor(row_factory=records[type]) as c:
+        c.execute(f"""
+            SELECT {type}.* FROM {type}_fts JOIN {type} ON {type}.id = {type}_fts.rowid
+            WHERE {type}_fts MATCH ? ORDER BY bm25({type}_fts, {weights}) LIMIT ?
+            """, (query, limit))
+        data = c.fetchall()
+
+    if not data:
+        logger.info(f"No {type} matched search '{text}'")
+    return data
@@ -0,0 +1,192 @@
+import logging
+from datetime import date, timedelta
+from .connection import db
+from .errors import InvalidInputError, database_errors
+from .records import validate_type
+from .cache import cached_query
+
+logger = logging.getLogger(__name__)
+
+
+@cached_query
+def statistics(type): #reads the summary tables, so it takes the same time however many rows there are
+    validate_type(type)
+
+    with database_errors(), db.cursor() as c:
+        c.execute("SELECT total, elevation_sum, ascension_sum FROM stats_totals WHERE type=?", (type,))
+        total, elevation_sum, ascension_sum = c.fetchone()
+
+        c.execute("SELECT state, count FROM stats_by_state WHERE type=? ORDER BY state", (type,))
+        state_counts = c.fetchall()
+
+    if type == 'mountain': #averages of ascension and elevation if type is mountain (None if there are none, like AVG)
+        average_ascension = ascension_sum / total if total else None
+        average_elevation = elevation_sum / total if total else None
+    else: #still needs values for ascension and elevation even if its campsite, so just leaving it 0
+        average_ascension = 0
+        average_elevation = 0
+
+    state_total = len(state_counts) #works cause "state_counts" is a tuple
+
+    logger.info(f'Total {type}s found: {total}, Total states: {state_total}')
+
+    formatted_text = []
+    for state, count in state_counts:
+        formatted_text.append(f'{state}: {count}')
+
+    return state_total, total, formatted_text, average_ascension, average_elevation
+
+
+#=== Distributions ===
+"""
+distribution() gives the spread of each numeric field instead of just the average: min, max, mean, median,
+percentiles and a histogram, plus the count and the medians of each state.
+It works from the stats_values counts (see schema.py), so a million mountains are under 200,000 rows here.
+Elevation and ascension are to the nearest 10 ft, time_completed is in minutes.
+"""
+HISTOGRAM_BINS = 10
+PERCENTILES = (10, 25, 50, 75, 90)
+
+def weighted_percentiles(values, counts, percentiles): #same as numpy.percentile on the values repeated count times
+    import numpy as np
+
+    ends = np.cumsum(counts) #ends[i] is the rank just past the last copy of values[i]
+    ranks = np.asarray(percentiles, dtype=float) / 100 * (ends[-1] - 1)
+    lower = np.floor(ranks)
+    below = values[np.searchsorted(ends, lower, side='right')]
+    above = values[np.searchsorted(ends, np.minimum(lower + 1, ends[-1] - 1), side='right')]
+    return below + (above - below) * (ranks - lower)
+
+@cached_query
+def distribution(type, bins=HISTOGRAM_BINS):
+    """
+    Returns {'total': rows, 'fields': {field: summary}, 'by_state': {state: {'count': rows, 'median': {field: value}}}}
+    where a summary is {'min', 'max', 'mean', 'median', 'percentiles': {p: value}, 'histogram': [(low, high, count)]}.
+    Fields with no values are left out.
+    """
+    import numpy as np
+    validate_type(type)
+
+    with database_errors(), db.cursor() as c:
+        #in primary key order, so sqlite reads it straight off the table without sorting
+        c.execute("SELECT field, state, value, count FROM stats_values WHERE type=? ORDER BY field, state, value", (type,))
+        rows = c.fetchall()
+        c.execute("SELECT state, count FROM stats_by_state WHERE type=? ORDER BY state", (type,))
+        state_counts = c.fetchall()
+
+    by_field = {}
+    for field, state, value, count in rows:
+        by_field.setdefault(field, []).append((state, value, count))
+
+    fields = {}
+    by_state = {state: {'count': count, 'median': {}} for state, count in state_counts}
+    for field, field_rows in by_field.items():
+        values = np.array([row[1] for row in field_rows], dtype=float)
+        counts = np.array([row[2] for row in field_rows], dtype=np.int64)
+
+        #each state's values are already in order, the whole field gets sorted once here
+        order = np.argsort(values, kind='stable')
+        sorted_values, sorted_counts = values[order], counts[order]
+        found = weighted_percentiles(sorted_values, sorted_counts, (50, *PERCENTILES))
+        histogram, edges = np.histogram(values, bins=bins, weights=counts)
+        fields[field] = {
+            'min': float(sorted_values[0]),
+            'max': float(sorted_values[-1]),
+            'mean': float(np.average(values, weights=counts)),
+            'median': float(found[0]),
+            'percentiles': {p: float(value) for p, value in zip(PERCENTILES, found[1:])},
+            'histogram': [(float(edges[i]), float(edges[i + 1]), int(histogram[i])) for i in range(len(histogram))]
+        }
+
+        start = 0
+        for i in range(1, len(field_rows) + 1): #one slice per state
+            if i == len(field_rows) or field_rows[i][0] != field_rows[start][0]:
+                state = field_rows[start][0]
+                median = float(weighted_percentiles(values[start:i], counts[start:i], (50,))[0])
+                by_state.setdefault(state, {'count': int(counts[start:i].sum()), 'median': {}})['median'][field] = median
+                start = i
+
+    total = sum(count for state, count in state_counts)
+    logger.info(f'Distribution of {total} {type}s over {len(fields)} fields.')
+    return {'total': total, 'fields': fields, 'by_state': by_state}
+
+
+#=== Climb History ===
+"""
+Reads the climb_rollups totals (see schema.py) for the mountain history: totals per week/month/year,
+streaks of weeks with a climb in them, and each year against the one before.
+Pace is ascension per hour of time completed.
+"""
+ROLLUP_PERIODS = ('week', 'month', 'year')
+
+def rollup_row(start, climbs, ascension, elevation, minutes):
+    return {
+        'start': start,
+        'climbs': climbs,
+        'ascension': ascension,
+        'elevation': elevation,
+        'minutes': minutes,
+        'average_minutes': minutes / climbs,
+        'pace': ascension / minutes * 60 if minutes else None #ft per hour
+    }
+
+@cached_query
+def climb_rollups(period='month', start=None, end=None): #totals for each period with a climb, oldest first, start/end are 'YYYY-MM-DD'
+    if period not in ROLLUP_PERIODS:
+        raise InvalidInputError(f"Period must be one of: {', '.join(ROLLUP_PERIODS)}.")
+
+    query = "SELECT start, climbs, ascension, elevation, minutes FROM climb_rollups WHERE period=?"
+    params = [period]
+    if start is not None:
+        query += " AND start >= ?"
+        params.append(start)
+    if end is not None:
+        query += " AND start <= ?"
+        params.append(end)
+
+    with database_errors(), db.cursor() as c:
+        c.execute(query + " ORDER BY start", params)
+        return [rollup_row(*row) for row in c.fetchall()]
+
+def climb_streaks(today=None): #longest and current run of weeks in a row with at least one climb, not cached since it depends on today
+    today = today or date.today()
+    weeks = [date.fromisoformat(row['start']) for row in climb_rollups('week')]
+
+    longest = (0, None, None) #(weeks, first week, last week)
+    run_start = None
+    for i, week in enumerate(weeks):
+        if i == 0 or week - weeks[i - 1] != timedelta(weeks=1):
+            run_start = i
+        length = i - run_start + 1
+        if length > longest[0]:
+            longest = (length, weeks[run_start].isoformat(), week.isoformat())
+
+    #the current streak still counts if this week has no climb yet but last week did
+    this_week = today - timedelta(days=today.weekday())
+    current = 0
+    if weeks and this_week - weeks[-1] <= timedelta(weeks=1):
+        current = len(weeks) - run_start
+
+    return {'longest': longest, 'current': current}
+
+@cached_query
+def year_over_year(): #each year's totals, its climbs per month and the change from the year before
+    years = climb_rollups('year')
+    months = climb_rollups('month')
+
+    comparison = []
+    previous = None
+    for year in years:
+        row = dict(year, year=int(year['start'][:4]), months=[0] * 12)
+        for month in months:
+            if month['start'][:4] == year['start'][:4]:
+                row['months'][int(month['start'][5:7]) - 1] = month['climbs']
+
+        row['change'] = {} #percent change from the year before, None if there's nothing to compare with
+        for key in ('climbs', 'ascension', 'elevation', 'pace'):
+            before = previous[key] if previous is not None and previous['year'] == row['year'] - 1 else None
+            row['change'][key] = (row[key] - before) / before * 100 if before and row[key] is not None else None
+        comparison.append(row)
+        previous = row
+
+    return comparison
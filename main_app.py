@@ -7,12 +7,15 @@ import socketserver
 import socket
 import threading
 import time
-from PyQt6.QtCore import Qt, QTimer
+import json
+from urllib.parse import urlparse, parse_qs
+from PyQt6.QtCore import Qt, QTimer, QThread, QObject, pyqtSignal
 from PyQt6.QtCore import QTime, QDate, QUrl
-from PyQt6.QtGui import QPixmap, QIcon
+from PyQt6.QtGui import QPixmap, QIcon, QPainter, QColor
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6 import QtWidgets
-from PyQt6.QtWidgets import QMainWindow, QApplication, QTableWidgetItem, QMessageBox, QLabel
+from PyQt6.QtWidgets import QMainWindow, QApplication, QTableWidgetItem, QMessageBox, QLabel, QPushButton, QDialog, QVBoxLayout, QTableWidget, QFileDialog
+from PyQt6.QtWidgets import QWidget, QComboBox, QHBoxLayout, QProgressBar, QProgressDialog
 from UI_design import Ui_MainWindow
 
 
@@ -34,7 +37,8 @@ logging.basicConfig(format='%(asctime)s - %(levelname)s: %(message)s', filename=
 logger = logging.getLogger(__name__)
 logger.debug(f"Logger initialized in main_app.py.")
 
-import CampingDatabase_SQLite
+import basecamp_core
+from basecamp_core import BasecampError, NotFoundError
 
 
 #=== Server Code ===
@@ -44,8 +48,10 @@ This is because they are html files and PyQt6 views these are security risks.
 Getting the file from a local server circumvents this issue.
 """
 PORT = 8001 #any number above 1024 is good
+SERVER_WAIT = 10 #seconds the map waits for the server before giving up
 
 server = None #sets the server variable
+server_ready = threading.Event() #set once the server is taking connections, the map page waits for it
 
 class HTTPServer(socketserver.TCPServer): #extending server class to stop itself accordingly
     def __init__(self, server_address, RequestHandler):
@@ -58,6 +64,35 @@ class HTTPServer(socketserver.TCPServer): #extending server class to stop itself
         self.server_close()
 
 
+class MapRequestHandler(http.server.SimpleHTTPRequestHandler): #sends files like before, plus the map's data
+    api = { #path -> (core function, query parameters it takes)
+        '/api/tiles': (basecamp_core.map_tile, ('zoom', 'x', 'y'))
+    }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in self.api:
+            return super().do_GET()
+
+        function, names = self.api[url.path]
+        query = parse_qs(url.query)
+        try:
+            result = function(*(query.get(name, [None])[0] for name in names))
+            status = 200
+        except BasecampError as e: #bad parameters or a database error, the page gets the message
+            logger.warning(f"{url.path}: {e.error_type}: {e}")
+            result = {'error': f"{e.error_type}: {e}"}
+            status = 400
+
+        body = json.dumps(result, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store') #the data changes, so it's always asked for again
+        self.end_headers()
+        self.wfile.write(body)
+
+
 #starting a basic HTTP server:
 def start_server():
     global server
@@ -67,9 +102,14 @@ def start_server():
         script_dir = os.path.dirname(os.path.abspath(__file__)) #gets the directory of the script
     os.chdir(script_dir) #changes working directory to where the script is loaded
 
-    handler = http.server.SimpleHTTPRequestHandler
-    server = HTTPServer(('', PORT), handler)
+    handler = MapRequestHandler
+    try:
+        server = HTTPServer(('', PORT), handler)
+    except OSError as e: #server_ready is never set, so the map page says it couldn't load
+        logger.error(f"Couldn't start the server on port {PORT}: {e}")
+        return
     logger.info(f"Serving at http://localhost:{PORT}")
+    server_ready.set() #the socket is listening, requests wait in its queue until serve_forever picks them up
 
     #runs the server forever unless told otherwise
     try:
@@ -96,6 +136,7 @@ if not port_use(PORT): #makes sure port isn't in use
     server_thread.start()
 else:
     logger.info(f"Server is already running at http://localhost:{PORT}")
+    server_ready.set()
 
 def close_server():
     if server and server.running: #makes sure server exists before continuing and its running
@@ -107,6 +148,172 @@ def close_server():
 
 #=== PyQt Code ===
 
+def error_popup(error_type, error): #popup for errors.
+    logger.error(f"{error_type}: {error}")
+    pop = QMessageBox()
+    pop.setWindowTitle("Error")
+    pop.setText(f"{error_type}: {error}")
+    pop.setIcon(QMessageBox.Icon.Critical)
+    pop.exec()
+
+def no_delete(type, name): #popup for if delete doesn't work
+    logger.warning(f"No {type} has been found with name '{name}'")
+    pop = QMessageBox()
+    pop.setWindowTitle("Deletion Unsuccessful")
+    pop.setText(f"No {type} has been found with name: '{name}'.")
+    pop.setIcon(QMessageBox.Icon.Warning)
+    pop.exec()
+
+def no_modify(type, name):
+    logger.warning(f"No {type} found with name: {name}.")
+    pop = QMessageBox()
+    pop.setWindowTitle("Edit Unsuccessful")
+    pop.setText(f"No {type} found with name: {name}.")
+    pop.setIcon(QMessageBox.Icon.Warning)
+    pop.exec()
+
+
+CHART_PERIODS = {"Monthly": 'month', "Weekly": 'week', "Yearly": 'year'} #climb chart period comboBox -> rollup period
+CHART_MEASURES = {"Climbs": 'climbs', "Ascension (ft)": 'ascension', "Elevation (ft)": 'elevation', "Pace (ft/h)": 'pace'}
+CHART_BARS = {"Monthly": 24, "Weekly": 26, "Yearly": 20} #how many of the latest periods the chart shows
+STATS_FIELDS = {'rating': "Rating", 'elevation': "Elevation", 'ascension': "Ascension", 'time_completed': "Time"} #distribution rows, in order
+HISTOGRAM_BARS = " ▁▂▃▄▅▆▇█"
+
+def stat_text(field, value): #formats a distribution value for the stats pages
+    if field == 'time_completed': #counted in minutes
+        return f"{int(value) // 60:02d}:{int(value) % 60:02d}"
+    if field == 'rating':
+        return f"{value:g}"
+    return f"{value:,.0f} ft"
+
+
+class BarChart(QWidget): #simple bar chart drawn with QPainter, used for the climb history
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(160)
+        self.labels = []
+        self.values = []
+
+    def set_data(self, labels, values):
+        self.labels = labels
+        self.values = values
+        self.update() #repaints
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        text_height = painter.fontMetrics().height()
+        if not self.values:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No climbs yet")
+            return
+
+        chart_height = self.height() - 2 * text_height - 4 #room for the values above and the labels below
+        bar_width = self.width() / len(self.values)
+        most = max(self.values) or 1
+        label_every = max(1, round(len(self.labels) * painter.fontMetrics().horizontalAdvance(self.labels[0] + "  ") / self.width()))
+
+        for i, (label, value) in enumerate(zip(self.labels, self.values)):
+            left = int(i * bar_width + bar_width * 0.1)
+            width = max(1, int(bar_width * 0.8))
+            height = int(value / most * chart_height)
+            top = text_height + chart_height - height
+            painter.fillRect(left, top, width, height, QColor(70, 130, 90))
+            if i % label_every == 0: #skips labels when there isn't room for all of them
+                painter.drawText(int(i * bar_width), self.height() - text_height, int(bar_width * label_every), text_height,
+                                 Qt.AlignmentFlag.AlignLeft, label)
+                if len(self.values) <= 30:
+                    painter.drawText(int(i * bar_width), top - text_height, int(bar_width), text_height,
+                                     Qt.AlignmentFlag.AlignCenter, f"{value:,.0f}")
+
+
+class RecordItem(QTableWidgetItem): #table cell for a Campsite/Mountain record, only formats the text when Qt asks for it
+    def __init__(self, record):
+        super().__init__()
+        self.record = record
+
+    def data(self, role):
+        if role == Qt.ItemDataRole.DisplayRole: #asked for when the cell is painted or sized
+            return self.record.display_text()
+        return super().data(role)
+
+
+class MapCancelled(Exception): #raised in the map build's progress callback to stop it
+    pass
+
+class MapBuilder(QThread): #builds the map page off the GUI thread, once the server is up
+    progress = pyqtSignal(int, int, str) #step, steps, message
+    built = pyqtSignal(bool) #True if the page was made again, False if the old one is still current
+    failed = pyqtSignal(str, str) #error type, message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.cancelled = threading.Event() #set when the user leaves the map page
+
+    def step(self, number, steps, message): #called by make_main_map between steps
+        if self.cancelled.is_set():
+            raise MapCancelled
+        self.progress.emit(number, steps, message)
+
+    def run(self):
+        self.progress.emit(0, len(basecamp_core.MAP_STEPS), "Waiting for the map server")
+        deadline = time.monotonic() + SERVER_WAIT
+        while not server_ready.wait(0.1): #in short waits, so leaving the page stops this too
+            if self.cancelled.is_set():
+                return
+            if time.monotonic() > deadline:
+                self.failed.emit("Server Error", f"The map server on port {PORT} didn't start.")
+                return
+        try:
+            rebuilt = basecamp_core.make_main_map(progress=self.step)
+        except MapCancelled:
+            logger.info("Map build cancelled.")
+            return
+        except BasecampError as e:
+            self.failed.emit(e.error_type, f"{e}")
+            return
+        self.built.emit(rebuilt)
+
+
+class ImportCancelled(Exception): #raised in the import's progress callback to stop it
+    pass
+
+class ImportWorker(QThread): #runs an import (and the backup before it) off the GUI thread
+    progress = pyqtSignal(int) #rows read so far
+    done = pyqtSignal(dict) #import_file's report
+    failed = pyqtSignal(str, str) #error type, message
+
+    def __init__(self, path, type, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.type = type
+        self.cancelled = threading.Event() #set by the progress dialog's cancel button
+        self.stopped = False #True if it was cancelled before it finished
+
+    def step(self, rows): #called by import_file every chunk of rows read
+        if self.cancelled.is_set():
+            raise ImportCancelled #the chunks already saved stay saved
+        self.progress.emit(rows)
+
+    def run(self):
+        try:
+            report = basecamp_core.import_file(self.path, self.type, progress=self.step)
+        except ImportCancelled:
+            self.stopped = True
+            logger.info("Import cancelled.")
+            return
+        except BasecampError as e:
+            self.failed.emit(e.error_type, f"{e}")
+            return
+        finally:
+            basecamp_core.db.release() #this thread's connection goes back to the pool
+        self.done.emit(report)
+
+
+class BackfillSignals(QObject): #carries the progress of the database backfills from their thread to the window
+    progress = pyqtSignal(str, int, int) #task, ids done, ids to do
+    finished = pyqtSignal()
+
+
 class Window(QMainWindow, Ui_MainWindow):
     def __init__(self):
         super().__init__()
@@ -218,6 +425,15 @@ class Window(QMainWindow, Ui_MainWindow):
         self.lineEdit_15.returnPressed.connect(self.search_submit) #when return is pressed, it searches
 
 
+        #Nearby functionality: lists what's closest to the selected search result
+        self.pushButton_nearby = QPushButton("Find Nearby", parent=self.campsite_search_2)
+        self.gridLayout_15.addWidget(self.pushButton_nearby, 5, 4, 1, 1)
+        self.pushButton_nearby.clicked.connect(self.show_nearby)
+        self.pushButton_nearby_2 = QPushButton("Find Nearby", parent=self.mountain_search_2)
+        self.gridLayout_16.addWidget(self.pushButton_nearby_2, 5, 4, 1, 1)
+        self.pushButton_nearby_2.clicked.connect(self.show_nearby)
+
+
         #Campsite display functionality:
         self.comboBox_5.clear()
         self.comboBox_5.addItems(["Name", "State", "Rating"]) #adding items to column comboBox
@@ -234,7 +450,7 @@ class Window(QMainWindow, Ui_MainWindow):
         #comboBox:
         self.comboBox.clear() #clears previous entries
         self.comboBox.addItem("") #adds blank entry
-        self.comboBox.addItems(sorted(CampingDatabase_SQLite.US_States)) #adding states to comboBox
+        self.comboBox.addItems(sorted(basecamp_core.US_States)) #adding states to comboBox
 
         self.pushButton_17.clicked.connect(self.reset_clicked_create) #reset button
         #slider:
@@ -251,6 +467,13 @@ class Window(QMainWindow, Ui_MainWindow):
         }
 
 
+        #Campsite import functionality:
+        self.pushButton_import = QPushButton("Import File", parent=self.create_campsite)
+        self.horizontalLayout.addWidget(self.pushButton_import)
+        self.pushButton_import.clicked.connect(self.import_clicked)
+        self.import_worker = None #the ImportWorker that's running, if any
+
+
         #Campsite delete functionality:
         self.pushButton_18.clicked.connect(self.delete_clicked) #delete pressed
         self.lineEdit_3.returnPressed.connect(self.delete_clicked) #when enter is pressed
@@ -279,6 +502,25 @@ class Window(QMainWindow, Ui_MainWindow):
         self.pushButton_24.clicked.connect(self.display_data)  # if apply button clicked
         self.pushButton_23.clicked.connect(self.reset_clicked_display)  #if reset clicked
 
+        #Display export: saves what the display table is showing (or the whole table if nothing has been applied)
+        self.pushButton_export = QPushButton("Export", parent=self.campsite_display)
+        self.pushButton_export.setMaximumSize(125, 16777215)
+        self.horizontalLayout_25.addWidget(self.pushButton_export)
+        self.pushButton_export.clicked.connect(self.export_clicked)
+        self.pushButton_export_2 = QPushButton("Export", parent=self.mountain_display)
+        self.pushButton_export_2.setMaximumSize(125, 16777215)
+        self.horizontalLayout_33.addWidget(self.pushButton_export_2)
+        self.pushButton_export_2.clicked.connect(self.export_clicked)
+
+        #Display paging: the display tables load one page at a time, the next page loads when scrolled to the bottom
+        self.display_pages = {} #table -> (Query, token for the next page)
+        for line_edit in (self.lineEdit_5, self.lineEdit_9): #the value box also takes a filter expression
+            line_edit.setPlaceholderText("Value, or a filter like: rating >= 4 and state in (Maine, Vermont)")
+        for table in (self.tableWidget_2, self.tableWidget_4):
+            table.verticalScrollBar().valueChanged.connect(self.display_scrolled)
+        for table in (self.tableWidget, self.tableWidget_3, self.tableWidget_2, self.tableWidget_4): #tables that show records
+            table.verticalScrollBar().valueChanged.connect(lambda value, table=table: self.resize_visible_rows(table))
+
 
         #Mountain create functionality:
         self.pushButton_27.clicked.connect(self.mountain_create_submit) #submit button
@@ -289,7 +531,7 @@ class Window(QMainWindow, Ui_MainWindow):
         #comboBox:
         self.comboBox_3.clear() #clears previous entries
         self.comboBox_3.addItem("") #adds blank space
-        self.comboBox_3.addItems(sorted(CampingDatabase_SQLite.US_States)) #adds states to comboBox
+        self.comboBox_3.addItems(sorted(basecamp_core.US_States)) #adds states to comboBox
 
         #slider:
         self.horizontalSlider_2.setMinimum(1)
@@ -299,6 +541,12 @@ class Window(QMainWindow, Ui_MainWindow):
         self.horizontalSlider_2.valueChanged.connect(self.update_rating_label)  # updates label next to slider
 
 
+        #Mountain import functionality:
+        self.pushButton_import_2 = QPushButton("Import File", parent=self.create_mountain)
+        self.horizontalLayout_23.addWidget(self.pushButton_import_2)
+        self.pushButton_import_2.clicked.connect(self.import_clicked)
+
+
         #Mountain delete functionality:
         self.pushButton_28.clicked.connect(self.delete_clicked) #if delete clicked
         self.lineEdit_14.returnPressed.connect(self.delete_clicked) #if return pressed
@@ -314,10 +562,54 @@ class Window(QMainWindow, Ui_MainWindow):
         #Statistics functionality:
         self.stackedWidget.currentChanged.connect(self.statistics) #checks the index if it's the right page and if so it runs the stats
 
+        #Distribution tables: percentiles and a histogram of each field, under the by-state table
+        self.tableWidget_distribution = QTableWidget(parent=self.campsite_stats)
+        self.tableWidget_distribution.setMaximumSize(16777215, 80) #campsites only have rating
+        self.gridLayout_11.removeWidget(self.widget_48) #moves the bottom spacer down a row
+        self.gridLayout_11.addWidget(self.tableWidget_distribution, 8, 2, 1, 1)
+        self.gridLayout_11.addWidget(self.widget_48, 9, 2, 1, 1)
+        self.tableWidget_distribution_2 = QTableWidget(parent=self.mountain_stats)
+        self.tableWidget_distribution_2.setMaximumSize(16777215, 170)
+        self.gridLayout_12.removeWidget(self.widget_53)
+        self.gridLayout_12.addWidget(self.tableWidget_distribution_2, 13, 1, 1, 1)
+
+        #Climb history: bar chart of the climbs per week/month/year, with the streaks and the change from last year
+        self.climb_controls = QWidget(parent=self.mountain_stats)
+        controls_layout = QHBoxLayout(self.climb_controls)
+        controls_layout.setContentsMargins(0, 0, 0, 0)
+        self.comboBox_period = QComboBox()
+        self.comboBox_period.addItems(CHART_PERIODS)
+        self.comboBox_measure = QComboBox()
+        self.comboBox_measure.addItems(CHART_MEASURES)
+        self.label_history = QLabel()
+        controls_layout.addWidget(self.comboBox_period)
+        controls_layout.addWidget(self.comboBox_measure)
+        controls_layout.addWidget(self.label_history, 1)
+        self.climb_chart = BarChart(parent=self.mountain_stats)
+        self.gridLayout_12.addWidget(self.climb_controls, 14, 1, 1, 1)
+        self.gridLayout_12.addWidget(self.climb_chart, 15, 1, 1, 1)
+        self.gridLayout_12.addWidget(self.widget_53, 16, 1, 1, 1)
+        self.comboBox_period.currentTextChanged.connect(self.climb_history)
+        self.comboBox_measure.currentTextChanged.connect(self.climb_history)
+
 
         #Map page functionality:
+        self.map_builder = None #the MapBuilder that's running, if any
+        self.map_loaded = False #if main_web_view has the page yet
         self.stackedWidget.currentChanged.connect(self.load_main_map) #if index == map_page, then the map loads
 
+
+        #Database update progress: after the first query the backfills run on a thread of their own
+        self.backfill_bar = QProgressBar()
+        self.backfill_bar.setMaximumWidth(300)
+        self.backfill_bar.hide()
+        self.statusBar().addPermanentWidget(self.backfill_bar)
+        self.backfill_signals = BackfillSignals(self)
+        self.backfill_signals.progress.connect(self.backfill_progress)
+        self.backfill_signals.finished.connect(self.backfill_finished)
+        basecamp_core.db.backfill_progress = self.backfill_signals.progress.emit
+        basecamp_core.db.backfill_finished = self.backfill_signals.finished.emit
+
     #Sidebar button clicking functionality:
     def page_click(self):
         clicked_button = self.sender()
@@ -331,17 +623,14 @@ class Window(QMainWindow, Ui_MainWindow):
     #displaying info functions:
     def search_submit(self): #search button functionality
         clicked_button = self.sender()
+        results_page = None #page to switch to if searching from the first search page
 
         #These if statements also account for "enter" being pressed in the lineEdits.
         if clicked_button == self.pushButton_11 or clicked_button == self.lineEdit: #if you search on campsite_search
             type = 'campsite'
             name = self.lineEdit.text().strip() #grabs the campsite name from lineEdit
             self.table = self.tableWidget
-
-            data = CampingDatabase_SQLite.item_search(name, type)
-            if data: #if data is empty, doesn't change index
-                self.stackedWidget.setCurrentIndex(1) #sets index to search w/ tableWidget to show campsite (campsite_search_2)
-
+            results_page = 1 #search w/ tableWidget to show campsite (campsite_search_2)
         elif clicked_button == self.pushButton_29 or clicked_button == self.lineEdit_15: #if you search on campsite_search_2 (results are already shown)
             type = 'campsite'
             name = self.lineEdit_15.text().strip()
@@ -350,10 +639,7 @@ class Window(QMainWindow, Ui_MainWindow):
             type = 'mountain'
             name = self.lineEdit_8.text().strip()
             self.table = self.tableWidget_3
-
-            data = CampingDatabase_SQLite.item_search(name, type)
-            if data:  # if data is empty, doesn't change index
-                self.stackedWidget.setCurrentIndex(14)
+            results_page = 14
         elif clicked_button == self.pushButton_31 or clicked_button == self.lineEdit_16:
             type = 'mountain'
             name = self.lineEdit_16.text().strip()
@@ -366,7 +652,14 @@ class Window(QMainWindow, Ui_MainWindow):
             logger.error(f"No {type} name entered")
             return
 
-        data = CampingDatabase_SQLite.item_search(name, type) #you have to be specific when referencing functions from imported code
+        try:
+            data = basecamp_core.full_text_search(name, type) #you have to be specific when referencing functions from imported code
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+
+        if data and results_page is not None: #if data is empty, doesn't change index
+            self.stackedWidget.setCurrentIndex(results_page) #changing page clears the table, so this happens before it's filled
 
         header_title = "Search Results"
 
@@ -406,21 +699,37 @@ class Window(QMainWindow, Ui_MainWindow):
             table.verticalHeader().setMaximumSectionSize(225)
 
 
-        table.setRowCount(len(results))  # sets row count relative to the data
-        for row, result in enumerate(results): #goes through each result and displays it
+        table.setRowCount(0)
+        self.add_rows(results, table)
+
+        table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch) #resizes the contents of the table to the tableWidget
+
+    def add_rows(self, results, table): #adds results to the end of a table
+        start = table.rowCount()
+        table.setRowCount(start + len(results))  # sets row count relative to the data
+        for row, result in enumerate(results, start): #goes through each result and displays it
 
             #Result Display:
-            item = QTableWidgetItem(result)
+            if isinstance(result, str): #plain text, like the statistics tables
+                item = QTableWidgetItem(result)
+            else: #a record, formatted when it's painted
+                item = RecordItem(result)
             item.setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable) #makes it so it isn't editable
 
             item.setTextAlignment(Qt.AlignmentFlag.AlignTop) #aligns the results to the top
             table.setWordWrap(True)
 
             table.setItem(row, 0, item)
+            if isinstance(result, str): #plain text is already there, so sizing it costs nothing
+                table.resizeRowToContents(row)
+        self.resize_visible_rows(table) #records are only formatted (and sized) once they're in view
 
-
-        table.resizeRowsToContents()
-        table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch) #resizes the contents of the table to the tableWidget
+    def resize_visible_rows(self, table): #sizes the rows in view to their text, the others keep the default height
+        height = table.viewport().height()
+        row = max(table.rowAt(0), 0)
+        while row < table.rowCount() and table.rowViewportPosition(row) < height: #positions move as rows above grow
+            table.resizeRowToContents(row)
+            row += 1
 
     def display_data(self):
         clicked_button = self.sender()
@@ -436,19 +745,143 @@ class Window(QMainWindow, Ui_MainWindow):
 
             column = self.comboBox_6.currentText().strip().lower()
             if column == "time taken":
-                column = "time" #sort_and_filter only takes "time"
+                column = "time" #the query builder only takes "time"
 
             order = self.comboBox_7.currentText().strip()
-            value = self.lineEdit_6.text().strip()
+            value = self.lineEdit_9.text().strip()
             table = self.tableWidget_4
 
 
-        data = CampingDatabase_SQLite.sort_and_filter(column, value, order, type)
+        try:
+            if basecamp_core.looks_like_filter(value): #a filter like "rating >= 4 and state in (Maine, Vermont)"
+                query = basecamp_core.parse_filter(type, value)
+            elif value: #a plain value matches the column, like before
+                query = basecamp_core.Query(type).where(column, '=', value)
+            else:
+                query = basecamp_core.Query(type)
+            query = query.order_by(column, order)
+            data, token = query.page() #only the first page
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+        self.display_pages[table] = (query, token)
 
         header_title = "Search Results"
 
         self.populate_table(data, table, header_title, type) #populates display tableWidget
         if not data: self.no_results() #if data is empty, runs no results popup
+        self.fill_display(table)
+
+    def export_clicked(self): #exports the current display results to a file
+        if self.sender() == self.pushButton_export:
+            type = 'campsite'
+            table = self.tableWidget_2
+        else:
+            type = 'mountain'
+            table = self.tableWidget_4
+
+        path, _ = QFileDialog.getSaveFileName(self, f"Export {type.title()}s", f"{type}s.csv",
+                                              "CSV (*.csv);;JSON Lines (*.jsonl);;GeoJSON (*.geojson)")
+        if not path: #cancelled
+            return
+
+        query = None
+        if table in self.display_pages:
+            query, _ = self.display_pages[table]
+
+        try:
+            count = basecamp_core.export_items(path, type, query=query)
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            self.notification("Export failed")
+            return
+        self.notification(f"Exported {count} {type}s")
+
+    def display_scrolled(self, value): #loads the next page once the display table is scrolled to the bottom
+        scroll_bar = self.sender()
+        if value < scroll_bar.maximum():
+            return
+
+        for table in self.display_pages:
+            if table.verticalScrollBar() == scroll_bar:
+                if self.load_next_page(table):
+                    self.fill_display(table)
+                break
+
+    def fill_display(self, table): #without a scroll bar there's no bottom to scroll to, so pages load until the table is full
+        while not self.rows_fill_view(table) and self.load_next_page(table):
+            pass
+
+    def rows_fill_view(self, table): #if the last row reaches the bottom of the table
+        last = table.rowCount() - 1
+        return last >= 0 and table.rowViewportPosition(last) + table.rowHeight(last) > table.viewport().height()
+
+    def load_next_page(self, table): #returns True if a page was added
+        query, token = self.display_pages[table]
+        if token is None: #no more pages
+            return False
+
+        try:
+            data, token = query.page(after=token)
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return False
+        self.display_pages[table] = (query, token)
+        self.add_rows(data, table)
+        return True
+
+    def show_nearby(self): #pop-up listing the campsites and mountains closest to the selected result
+        if self.sender() == self.pushButton_nearby:
+            from_type = 'campsite'
+            table = self.tableWidget
+        else:
+            from_type = 'mountain'
+            table = self.tableWidget_3
+
+        item = table.currentItem()
+        if not isinstance(item, RecordItem):
+            self.notification("Select a result first")
+            return
+        name = item.record.name
+
+        results = []
+        try:
+            for type in ('campsite', 'mountain'):
+                for distance, record in basecamp_core.nearest_to_item(name, from_type, type, k=10):
+                    results.append((type, record.name, record.state, record.rating, distance))
+        except NotFoundError: #the item has no coordinates
+            results = []
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+        if not results:
+            self.no_results()
+            return
+
+        pop = QDialog(self)
+        pop.setWindowTitle(f"Nearby: {name}")
+        pop.resize(600, 400)
+        layout = QVBoxLayout(pop)
+
+        nearby_table = QTableWidget(len(results), 5, pop)
+        nearby_table.setHorizontalHeaderLabels(["Type", "Name", "State", "Rating", "Distance (km)"])
+        nearby_table.verticalHeader().setVisible(False)
+        for row, values in enumerate(results):
+            for column, value in enumerate(values):
+                cell = QTableWidgetItem()
+                if column == 4:
+                    value = round(value, 1)
+                elif column == 0:
+                    value = value.title()
+                cell.setData(Qt.ItemDataRole.DisplayRole, value) #numbers stay numbers so they sort correctly
+                cell.setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable)
+                nearby_table.setItem(row, column, cell)
+
+        nearby_table.setSortingEnabled(True) #clicking a header sorts by that column
+        nearby_table.sortItems(4, Qt.SortOrder.AscendingOrder)
+        nearby_table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(nearby_table)
+        pop.exec()
 
     def no_results(self): #no results pop-up
         pop = QMessageBox(self)
@@ -478,10 +911,13 @@ class Window(QMainWindow, Ui_MainWindow):
 
         info = [name, state, rating, description, URL, longitude, latitude] #puts all info into 1 variable
 
-        done = CampingDatabase_SQLite.create_item('campsite',info)
+        try:
+            basecamp_core.create_item('campsite',info)
+        except BasecampError as e: #invalid input or a database error
+            error_popup(e.error_type, e)
+            return
 
-        if done: #checks if it success
-            self.notification("Campsite Created") #success notification
+        self.notification("Campsite Created") #success notification
 
     def mountain_create_submit(self):
         #grabs the info from the page
@@ -499,10 +935,60 @@ class Window(QMainWindow, Ui_MainWindow):
 
         info = [name, state, rating, elevation, ascension, time, description, date, URL, longitude, latitude] #puts all info into 1 variable
 
-        done = CampingDatabase_SQLite.create_item('mountain',info)
+        try:
+            basecamp_core.create_item('mountain',info)
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+
+        self.notification("Mountain Created") #success notification
 
-        if done:
-            self.notification("Mountain Created") #success notification
+    def import_clicked(self): #imports campsites/mountains from a file
+        type = 'campsite' if self.sender() == self.pushButton_import else 'mountain'
+
+        path, _ = QFileDialog.getOpenFileName(self, f"Import {type.title()}s", "", "Data Files (*.csv *.geojson *.json *.gpx)")
+        if not path: #cancelled
+            return
+
+        #the import runs on a worker so the window keeps responding, the dialog shows how far it got
+        self.import_worker = ImportWorker(path, type, parent=self)
+        self.import_progress = QProgressDialog(f"Backing up before importing {type}s...", "Cancel", 0, 0, self)
+        self.import_progress.setWindowTitle("Importing")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal) #no edits while it's importing
+        self.import_progress.setMinimumDuration(0)
+        self.import_progress.canceled.connect(self.import_worker.cancelled.set)
+        self.import_progress.show()
+        self.import_worker.progress.connect(lambda rows: self.import_progress.setLabelText(f"Importing {type}s... {rows:,} rows read"))
+        self.import_worker.done.connect(self.import_done)
+        self.import_worker.failed.connect(self.import_failed)
+        self.import_worker.finished.connect(self.import_finished)
+        self.import_worker.start()
+
+    def import_done(self, report):
+        type = self.sender().type
+        self.import_progress.reset() #closes the dialog
+        pop = QMessageBox(self)
+        pop.setWindowTitle("Import Finished")
+        pop.setText(f"Imported {report['inserted']} of {report['rows']} {type}s.")
+        if report['errors']: #lists the rows that were skipped and why
+            pop.setIcon(QMessageBox.Icon.Warning)
+            pop.setInformativeText(f"{len(report['errors'])} row(s) could not be imported.")
+            pop.setDetailedText("\n".join(f"Row {number}: {error}" for number, error in report['errors']))
+        else:
+            pop.setIcon(QMessageBox.Icon.Information)
+        pop.exec()
+
+    def import_failed(self, error_type, message):
+        self.import_progress.reset()
+        error_popup(error_type, message)
+
+    def import_finished(self): #after done/failed, or after it stopped because it was cancelled
+        worker = self.sender()
+        self.import_progress.reset()
+        if worker.stopped:
+            self.notification("Import cancelled, the rows saved before it stopped were kept")
+        self.import_worker = None
+        worker.deleteLater()
 
     def update_rating_label(self, value): #updates label next to slider
         slider = self.sender()
@@ -536,8 +1022,15 @@ class Window(QMainWindow, Ui_MainWindow):
 
         delete = self.delete_confirm(type, name)
         if delete: #if confirmed, delete happens
-            done = CampingDatabase_SQLite.remove_item(name, type)
-            if done: self.notification(f"{type.title()}: {name} deleted") #success notification
+            try:
+                basecamp_core.remove_item(name, type)
+            except NotFoundError:
+                no_delete(type, name)
+                return
+            except BasecampError as e:
+                error_popup(e.error_type, e)
+                return
+            self.notification(f"{type.title()}: {name} deleted") #success notification
 
 
     def delete_confirm(self, type, name): #confirm delete pop-up
@@ -573,9 +1066,15 @@ class Window(QMainWindow, Ui_MainWindow):
                 column = "time" #replace_info function only takes time
             new_value = self.lineEdit_18.text().strip()
 
-        modify = CampingDatabase_SQLite.replace_info(name, type, column, new_value)
-        if modify: #to check if edit worked or not
-            self.notification(f"{type.capitalize()} {name}: {column.capitalize()} has been updated to {new_value}")
+        try:
+            basecamp_core.replace_info(name, type, column, new_value)
+        except NotFoundError:
+            no_modify(type, name)
+            return
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+        self.notification(f"{type.capitalize()} {name}: {column.capitalize()} has been updated to {new_value}")
 
 
     #stat functions:
@@ -583,13 +1082,33 @@ class Window(QMainWindow, Ui_MainWindow):
         if index == 11:
           type = 'campsite'
           table = self.tableWidget_5
+          distribution_table = self.tableWidget_distribution
         elif index == 5:
           type = 'mountain'
           table = self.tableWidget_6
+          distribution_table = self.tableWidget_distribution_2
         else:
             return
 
-        state_total, total, formatted_text, average_ascension, average_elevation = CampingDatabase_SQLite.statistics(type)
+        try:
+            state_total, total, formatted_text, average_ascension, average_elevation = basecamp_core.statistics(type)
+            distribution = basecamp_core.distribution(type)
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+
+        #adds each state's medians to its row, like "Maine: 12 (median elevation 4,500 ft, time 05:30)"
+        state_rows = []
+        for text in formatted_text:
+            medians = distribution['by_state'].get(text.split(':')[0], {}).get('median', {})
+            if medians:
+                medians = ", ".join(f"{name.lower()} {stat_text(field, medians[field])}" for field, name in STATS_FIELDS.items() if field in medians)
+                text = f"{text} (median {medians})"
+            state_rows.append(text)
+        formatted_text = state_rows #a new list, the one from statistics() isn't changed
+        self.populate_distribution(distribution, distribution_table)
+        if type == 'mountain':
+            self.climb_history()
 
         header_title = f"{type.title()}s by State"
 
@@ -608,20 +1127,126 @@ class Window(QMainWindow, Ui_MainWindow):
             self.populate_table(formatted_text, table, header_title, type)
 
 
+    def populate_distribution(self, distribution, table): #one row per field: min, percentiles, max and a histogram
+        headers = ["Min", *(f"{p}%" if p != 50 else "Median" for p in basecamp_core.PERCENTILES), "Max", "Histogram"]
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+
+        fields = [field for field in STATS_FIELDS if field in distribution['fields']]
+        table.setRowCount(len(fields))
+        table.setVerticalHeaderLabels([STATS_FIELDS[field] for field in fields])
+
+        for row, field in enumerate(fields):
+            summary = distribution['fields'][field]
+            values = [summary['min'], *summary['percentiles'].values(), summary['max']]
+            most = max(count for low, high, count in summary['histogram']) or 1
+            bars = "".join(HISTOGRAM_BARS[round(count / most * (len(HISTOGRAM_BARS) - 1))] for low, high, count in summary['histogram'])
+            for column, text in enumerate([*(stat_text(field, value) for value in values), bars]):
+                item = QTableWidgetItem(text)
+                item.setFlags(Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable) #not editable
+                table.setItem(row, column, item)
+
+        table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Stretch)
+        table.horizontalHeader().setSectionResizeMode(len(headers) - 1, QtWidgets.QHeaderView.ResizeMode.ResizeToContents) #histogram
+
+
+    def climb_history(self): #fills the climb chart and the streak/last year label on the mountain stats page
+        period = self.comboBox_period.currentText()
+        measure = CHART_MEASURES[self.comboBox_measure.currentText()]
+        try:
+            rollups = basecamp_core.climb_rollups(CHART_PERIODS[period])[-CHART_BARS[period]:] #only the most recent periods
+            streaks = basecamp_core.climb_streaks()
+            years = basecamp_core.year_over_year()
+        except BasecampError as e:
+            error_popup(e.error_type, e)
+            return
+
+        label_format = {'Weekly': 10, 'Monthly': 7, 'Yearly': 4}[period] #how much of the start date to show
+        self.climb_chart.set_data([row['start'][:label_format] for row in rollups], [row[measure] or 0 for row in rollups])
+
+        text = f"Current streak: {streaks['current']} week(s), longest: {streaks['longest'][0]}"
+        if len(years) > 1 and years[-2]['year'] == years[-1]['year'] - 1:
+            #compares the same months of both years, so a year that isn't over yet isn't compared to a whole one
+            months = QDate.currentDate().month() if years[-1]['year'] == QDate.currentDate().year() else 12
+            this_year, last_year = (sum(year['months'][:months]) for year in years[-2:][::-1])
+            if last_year:
+                text += f"  |  {years[-1]['year']} climbs vs {years[-2]['year']} so far: {(this_year - last_year) / last_year * 100:+.0f}%"
+        self.label_history.setText(text)
+
+
     #map page functions:
     def load_main_map(self, index):
-        if index == 7:
-            if not hasattr(self, "main_web_view"): #checks if main_web_view already exists
-                self.main_web_view = QWebEngineView()
-                self.gridLayout_17.addWidget(self.main_web_view)
+        if index != 7: #left the map page, a build that's still going isn't needed any more
+            if self.map_builder is not None:
+                self.map_builder.cancelled.set()
+            return
+
+        if not hasattr(self, "main_web_view"): #checks if main_web_view already exists
+            self.main_web_view = QWebEngineView()
+            self.map_progress = QProgressBar()
+            self.map_progress.hide()
+            self.gridLayout_17.addWidget(self.map_progress)
+            self.gridLayout_17.addWidget(self.main_web_view)
+
+        if self.map_builder is not None and not self.map_builder.cancelled.is_set():
+            return #still building from the last visit
+
+        #the build and the wait for the server run on a worker, so the window keeps responding
+        self.map_builder = MapBuilder(parent=self)
+        self.map_builder.progress.connect(self.map_build_progress)
+        self.map_builder.built.connect(self.map_built)
+        self.map_builder.failed.connect(self.map_build_failed)
+        self.map_builder.finished.connect(self.map_build_finished)
+        self.map_progress.show()
+        self.map_builder.start()
+
+    def map_build_progress(self, step, steps, message):
+        if self.sender() is not self.map_builder: #an older build that was cancelled
+            return
+        self.map_progress.setRange(0, steps)
+        self.map_progress.setValue(step)
+        self.map_progress.setFormat(message)
+
+    def map_built(self, rebuilt):
+        if self.sender() is not self.map_builder:
+            return
+        if not rebuilt and self.map_loaded: #the page is already loaded, it only asks the server for the points again
+            self.main_web_view.page().runJavaScript("window.basecampRefresh && basecampRefresh();")
+            return
+        file_url = QUrl(f"http://localhost:{PORT}/main_map.html")
+        logger.info(f"Loading map from {file_url}")
+        self.main_web_view.load(file_url)
+        self.map_loaded = True
+
+    def map_build_failed(self, error_type, message):
+        if self.sender() is not self.map_builder:
+            return
+        if self.stackedWidget.currentIndex() == 7: #no popup if the user has already left the map
+            error_popup(error_type, message)
+
+    def map_build_finished(self): #after built/failed, or after it stopped because it was cancelled
+        builder = self.sender()
+        if builder is self.map_builder:
+            self.map_builder = None
+            self.map_progress.hide()
+        builder.deleteLater()
+
+    def stop_workers(self): #a QThread can't be destroyed while it's running, so quitting stops them and waits
+        for worker in self.findChildren(MapBuilder) + self.findChildren(ImportWorker): #cancelled ones that haven't stopped yet too
+            worker.cancelled.set()
+            worker.wait()
 
-            time.sleep(1)
 
-            CampingDatabase_SQLite.make_main_map()
-            file_url = QUrl(f"http://localhost:{PORT}/main_map.html")
-            logger.info(f"Loading map from {file_url}")
-            self.main_web_view.load(file_url)
+    def backfill_progress(self, task, done, total): #results can be incomplete until this is done, so it's shown
+        self.backfill_bar.setRange(0, total)
+        self.backfill_bar.setValue(done)
+        self.backfill_bar.setFormat(f"Updating database ({task}) %p%")
+        self.backfill_bar.show()
 
+    def backfill_finished(self):
+        if self.backfill_bar.isVisible(): #there was something to do
+            self.backfill_bar.hide()
+            self.notification("Database update finished.")
 
     def notification(self, message):
         label = QLabel(message)
@@ -681,6 +1306,7 @@ class Window(QMainWindow, Ui_MainWindow):
         self.comboBox_5.setCurrentIndex(0)
         self.comboBox_4.setCurrentIndex(0)
         self.lineEdit_5.clear()
+        self.display_pages.pop(self.tableWidget_2, None)
         # clearing tableWidget:
         self.tableWidget_2.clear()
         self.tableWidget_2.setRowCount(0)
@@ -690,6 +1316,7 @@ class Window(QMainWindow, Ui_MainWindow):
         self.comboBox_6.setCurrentIndex(0)
         self.comboBox_7.setCurrentIndex(0)
         self.lineEdit_9.clear()
+        self.display_pages.pop(self.tableWidget_4, None)
         # clearing tableWidget:
         self.tableWidget_4.clear()
         self.tableWidget_4.setRowCount(0)
@@ -721,5 +1348,8 @@ app.setApplicationName("CampingDatabaseApp")
 window = Window()
 
 window.show()
+app.aboutToQuit.connect(window.stop_workers) #stops a map build or import that's still going
 app.aboutToQuit.connect(close_server) #closes the server before quiting
+app.aboutToQuit.connect(basecamp_core.backups.stop) #finishes any waiting backup
+app.aboutToQuit.connect(basecamp_core.db.close_all) #closes all database connections
 app.exec()
\ No newline at end of file
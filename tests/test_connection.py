@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+from basecamp_core import schema
+from basecamp_core.connection import ConnectionManager
+
+STATEMENT = "INSERT INTO copied SELECT id FROM source WHERE id > ? AND id <= ?"
+
+
+def make_database(path): #1000 rows whose copy is left to a backfill
+    conn = sqlite3.connect(path)
+    schema.migrate(conn)
+    with schema.transaction(conn) as c:
+        c.execute("CREATE TABLE source (id INTEGER PRIMARY KEY)")
+        c.execute("CREATE TABLE copied (id INTEGER)")
+        c.executemany("INSERT INTO source VALUES (?)", [(i,) for i in range(1, 1001)])
+        schema.schedule_backfill(c, 'copy', 'source')
+    conn.close()
+
+def backfill(conn, progress):
+    schema.run_backfill(conn, 'copy', STATEMENT, progress)
+
+def test_first_query_does_not_wait_for_the_backfill(tmp_path, monkeypatch):
+    path = str(tmp_path / "manager.db")
+    make_database(path)
+    monkeypatch.setattr(schema, 'MIGRATION_BATCH_SIZE', 50)
+    manager = ConnectionManager(path, setup=schema.update_schema, backfill=backfill)
+    go, finished = threading.Event(), threading.Event()
+    manager.backfill_progress = lambda task, done, total: go.wait(5) #held after its first batch
+    manager.backfill_finished = finished.set
+
+    with manager.cursor() as c: #answered off the partly filled table
+        assert c.execute("SELECT COUNT(*) FROM copied").fetchone()[0] < 1000
+    go.set()
+    assert finished.wait(5)
+
+    with manager.cursor() as c:
+        assert c.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM copied").fetchone() == (1000, 1000)
+    assert list(manager.connections) == [threading.current_thread()] #the backfill's connection went back to the pool
+    manager.close_all()
+
+def test_close_all_stops_the_backfill_between_batches(tmp_path, monkeypatch):
+    path = str(tmp_path / "manager.db")
+    make_database(path)
+    monkeypatch.setattr(schema, 'MIGRATION_BATCH_SIZE', 50)
+    manager = ConnectionManager(path, setup=schema.update_schema, backfill=backfill)
+    started = threading.Event()
+    def progress(task, done, total):
+        started.set()
+        manager.stopping.wait(5)
+    manager.backfill_progress = progress
+
+    manager.connection()
+    assert started.wait(5)
+    manager.close_all()
+    assert not manager.backfill_thread.is_alive()
+
+    conn = sqlite3.connect(path)
+    last_id, stop_id = conn.execute("SELECT last_id, stop_id FROM migration_progress WHERE task = 'copy'").fetchone()
+    assert 0 < last_id < stop_id #continues from there next time
+    assert conn.execute("SELECT COUNT(*) FROM copied").fetchone()[0] == last_id
+    conn.close()
@@ -0,0 +1,26 @@
+import sqlite3
+from basecamp_core import schema
+from basecamp_core.filtering import Query
+
+
+def test_next_page_of_one_name_seeks_on_the_index():
+    conn = sqlite3.connect(":memory:")
+    schema.migrate(conn)
+    with schema.transaction(conn) as c:
+        c.executemany("INSERT INTO campsite (name, state, rating) VALUES (?, 'Maine', 3)", [(f"camp {i % 10}",) for i in range(1000)])
+    conn.execute("ANALYZE")
+
+    query = Query('campsite').where('name', '=', 'camp 3').order_by('name')
+    sql, params = query.compile(after=('camp 3', 500))
+    assert "(name, id)" not in sql #name is the same on every row, only the id moves
+    plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    assert "idx_campsite_name (name=? AND rowid>?)" in plan #a range on the index, not every 'camp 3' row
+
+    ids = [row[0] for row in conn.execute(sql, params)]
+    assert ids == [i for i in range(501, 1001) if (i - 1) % 10 == 3]
+    conn.close()
+
+def test_next_page_keeps_the_row_value_for_keys_that_move():
+    sql, params = Query('mountain').where('state', '=', 'Maine').order_by('elevation', 'Descending').compile(after=(4000, 7))
+    assert "(elevation, id) < (?, ?)" in sql
+    assert params == ['Maine', 4000, 7]
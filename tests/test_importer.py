@@ -0,0 +1,18 @@
+from basecamp_core import importer, schema
+from basecamp_core.connection import ConnectionManager
+
+
+def test_progress_is_reported_on_a_file_of_bad_rows(tmp_path, monkeypatch):
+    manager = ConnectionManager(str(tmp_path / "import.db"), setup=schema.migrate)
+    monkeypatch.setattr(importer, 'db', manager)
+    monkeypatch.setattr(importer.backups, 'backup_now', lambda: None)
+    path = tmp_path / "bad.csv"
+    path.write_text("name,state,rating\n" + "".join(f"camp {i},Maine,9\n" for i in range(25))) #rating is out of range on every row
+
+    calls = []
+    report = importer.import_file(str(path), 'campsite', chunk_size=10, progress=calls.append)
+    manager.close_all()
+
+    assert report['inserted'] == 0 and len(report['errors']) == 25
+    assert calls[:2] == [10, 20] #reported while reading, not only once a chunk of valid rows is saved
+    assert calls[-1] == 25
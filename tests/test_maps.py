@@ -0,0 +1,15 @@
+import re
+import pytest
+
+pytest.importorskip("folium")
+from basecamp_core import maps
+
+
+def test_point_layer_runs_after_the_map_is_made():
+    html = maps.map_html()
+    made = re.search(r"var (map_\w+) = L\.map\(", html)
+    layer = re.search(r"var map = (map_\w+);", html)
+    assert made and layer
+    assert layer.group(1) == made.group(1) #the layer draws on this page's map
+    assert made.start() < layer.start() #the map has to exist before the layer is added to it
+    assert html.count("var PointLayer") == 1
@@ -0,0 +1,64 @@
+import sqlite3
+import threading
+import time
+from basecamp_core import schema
+
+
+def connect(path):
+    return sqlite3.connect(path, timeout=30, check_same_thread=False)
+
+def test_backfill_run_by_two_connections_applies_each_batch_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "backfill.db")
+    conn = connect(path)
+    schema.migrate(conn)
+    with schema.transaction(conn) as c:
+        c.execute("CREATE TABLE source (id INTEGER PRIMARY KEY)")
+        c.execute("CREATE TABLE copied (id INTEGER)") #no key, so a batch applied twice shows up as duplicates
+        c.executemany("INSERT INTO source VALUES (?)", [(i,) for i in range(1, 1001)])
+        schema.schedule_backfill(c, 'copy', 'source')
+    conn.close()
+
+    monkeypatch.setattr(schema, 'MIGRATION_BATCH_SIZE', 50)
+    statement = "INSERT INTO copied SELECT id FROM source WHERE id > ? AND id <= ?"
+    def run():
+        worker = connect(path)
+        #a short pause after each batch so the two connections take turns
+        schema.run_backfill(worker, 'copy', statement, lambda task, done, total: time.sleep(0.001))
+        worker.close()
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    conn = connect(path)
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT id) FROM copied").fetchone() == (1000, 1000)
+    assert conn.execute("SELECT COUNT(*) FROM migration_progress WHERE task = 'copy'").fetchone() == (0,)
+    conn.close()
+
+def test_search_index_stays_whole_when_rows_change_during_a_backfill(tmp_path):
+    conn = connect(str(tmp_path / "search.db"))
+    schema.migrate(conn)
+    if not schema.search_available:
+        return
+    with schema.transaction(conn) as c:
+        c.executemany("INSERT INTO campsite (name, state, rating, description) VALUES (?, 'Maine', 3, ?)",
+            [(f"camp {i}", f"word{i} lake") for i in range(1, 101)])
+        #as if the index was made after these rows and its backfill stopped halfway
+        c.execute("INSERT INTO campsite_fts(campsite_fts) VALUES ('delete-all')")
+        schema.schedule_backfill(c, 'campsite_fts', 'campsite')
+        c.execute("INSERT INTO campsite_fts(rowid, name, state, description) SELECT id, name, state, description FROM campsite WHERE id <= 50")
+        c.execute("UPDATE migration_progress SET last_id = 50 WHERE task = 'campsite_fts'")
+
+    with schema.transaction(conn) as c: #rows the backfill hasn't reached yet
+        c.execute("UPDATE campsite SET name = 'renamed' WHERE id = 70")
+        c.execute("DELETE FROM campsite WHERE id = 80")
+    schema.run_backfill(conn, 'campsite_fts', """
+        INSERT INTO campsite_fts(rowid, name, state, description) SELECT id, name, state, description FROM campsite WHERE id > ? AND id <= ?
+        """)
+
+    #with rank 1 the index is checked against the campsite rows too, raises "database disk image is malformed"
+    conn.execute("INSERT INTO campsite_fts(campsite_fts, rank) VALUES ('integrity-check', 1)")
+    assert conn.execute("SELECT rowid FROM campsite_fts WHERE campsite_fts MATCH 'renamed'").fetchall() == [(70,)]
+    conn.close()